@@ -0,0 +1,72 @@
+"""
+JSON encode microbenchmark: 10k-book list response
+
+Compares the previous path (stringify _id by hand, jsonable_encoder, then
+JSONResponse's json.dumps) with responses.MongoJSONResponse (orjson with
+native ObjectId/datetime encoding).
+
+Usage:
+    python benchmarks/bench_json.py [--books 10000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from responses import dumps, to_public
+
+
+def make_books(n: int) -> list:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Book title number {i}",
+            "author": f"Author {i % 500}",
+            "price": 9.99 + (i % 40),
+            "stock": i % 25,
+            "description": "A reasonably sized description of the book. " * 3,
+            "cover_url": f"https://covers.example.com/{i}.jpg",
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i),
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_encode(books: list) -> bytes:
+    docs = []
+    for b in books:
+        b = dict(b)
+        b["id"] = str(b.pop("_id"))
+        docs.append(b)
+    content = jsonable_encoder(docs)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def orjson_encode(books: list) -> bytes:
+    return dumps({"items": [to_public(dict(b)) for b in books], "next_cursor": None})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    books = make_books(args.books)
+    for name, fn in (("jsonable_encoder + json", legacy_encode), ("orjson (MongoJSONResponse)", orjson_encode)):
+        best = min(timeit.repeat(lambda: fn(books), number=1, repeat=args.repeat))
+        print(f"{name:<28} {best * 1000:8.2f} ms  ({len(fn(books)) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Catalog search microbenchmark (in memory, no database)
+
+Builds a BookSearchIndex/TrigramIndex pair over synthetic books whose words
+follow a Zipf-like distribution, then times index build, common and rare
+word queries, short-prefix typeahead and fuzzy suggestions.
+
+Usage:
+    python benchmarks/bench_search.py [--books 200000] [--repeat 50]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from search_index import BookSearchIndex, TrigramIndex
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "to", "ve", "na", "su", "el", "or", "an", "wa", "ti", "pe", "ju", "ro"]
+
+
+def vocabulary(size: int, rng: random.Random):
+    words = {"love", "war", "water", "world", "night", "house"}
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda w: (w not in ("love", "war", "water", "world", "night", "house"), w))
+
+
+def books(count: int, rng: random.Random):
+    words = vocabulary(50_000, rng)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+    for i in range(count):
+        title = " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(2, 5)))
+        author = " ".join(rng.choices(words, cum_weights=cum_weights, k=2))
+        description = " ".join(rng.choices(words, cum_weights=cum_weights, k=30))
+        yield f"{i:024x}", title, author, description
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    catalog = list(books(args.books, rng))
+    index, fuzzy = BookSearchIndex(), TrigramIndex()
+    tracemalloc.start()
+    started = time.perf_counter()
+    for book_id, title, author, description in catalog:
+        index.add(book_id, title, author, description)
+        fuzzy.add(book_id, title, author)
+    index.search("warm")  # first query sorts the vocabulary
+    build = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"build {args.books} books: {build:.1f}s, peak {peak / 2**20:.0f} MiB")
+
+    for query in ["love war", "love", "water world", "kalomi", "wa", "lo", "love wa"]:
+        print(f"search {query!r:14} {timed(lambda: index.search(query), args.repeat):8.2f} ms")
+    for query in ["lvoe", "wrold nigth"]:
+        print(f"suggest {query!r:13} {timed(lambda: fuzzy.suggest(query), args.repeat):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
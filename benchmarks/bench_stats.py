@@ -0,0 +1,82 @@
+"""
+Dashboard stats microbenchmark: four round trips vs one $group pass
+
+Seeds a scratch database with synthetic books/orders (if needed) and times
+the previous /admin/stats computation (three count_documents + one
+aggregate) against the single-pass version used by main.py.
+
+Usage:
+    DATABASE_URL=mongodb://localhost:27017 python benchmarks/bench_stats.py [--orders 200000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pymongo import MongoClient
+
+from main import DASHBOARD_STATS_PIPELINE
+
+STATUSES = ["pending", "processing", "shipped", "delivered", "cancelled"]
+
+
+def seed(db, books: int, orders: int):
+    now = datetime.now(timezone.utc)
+    if db["book"].estimated_document_count() < books:
+        db["book"].drop()
+        db["book"].insert_many([{"title": f"Book {i}", "author": "A", "price": 10.0, "stock": 5, "created_at": now, "updated_at": now} for i in range(books)])
+    if db["order"].estimated_document_count() < orders:
+        db["order"].drop()
+        db["order"].create_index([("status", 1), ("created_at", -1)])
+        for start in range(0, orders, 10000):
+            db["order"].insert_many([
+                {"customer_name": "C", "status": random.choice(STATUSES), "total_amount": round(random.uniform(5, 200), 2), "created_at": now, "updated_at": now}
+                for _ in range(min(10000, orders - start))
+            ])
+
+
+def legacy(db):
+    pipeline = [
+        {"$match": {"status": {"$ne": "cancelled"}}},
+        {"$group": {"_id": None, "sum": {"$sum": "$total_amount"}}},
+    ]
+    return (
+        db["book"].count_documents({}),
+        db["order"].count_documents({}),
+        db["order"].count_documents({"status": "pending"}),
+        list(db["order"].aggregate(pipeline)),
+    )
+
+
+def single_pass(db):
+    return db["book"].estimated_document_count(), list(db["order"].aggregate(DASHBOARD_STATS_PIPELINE))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", default="bench_stats")
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    db = MongoClient(os.environ["DATABASE_URL"])[args.database]
+    seed(db, args.books, args.orders)
+    for name, fn in (("3x count + aggregate", legacy), ("single $group pass", single_pass)):
+        fn(db)  # warm up
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            fn(db)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"{name:<22} median {timings[len(timings) // 2] * 1000:8.2f} ms  best {timings[0] * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Catalog Cache
+
+Bounded in-process LRU + TTL cache in front of the `book` collection.
+Entries hold the encoded JSON response bodies (bytes): far smaller than the
+decoded dicts and ready to send without re-serializing. Writes in this
+process invalidate immediately; other workers converge within the TTL.
+
+Only touched from the event loop, so no locking is needed.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+CATALOG_CACHE_MAX_BOOKS = int(os.getenv("CATALOG_CACHE_MAX_BOOKS", "500000"))
+CATALOG_CACHE_MAX_LISTS = int(os.getenv("CATALOG_CACHE_MAX_LISTS", "1024"))
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+
+
+class LRUCache:
+    """Least-recently-used cache with a per-entry time to live"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# (body, updated_at) keyed by book id; (body, etag, last_modified) keyed by list query
+books = LRUCache(CATALOG_CACHE_MAX_BOOKS, CATALOG_CACHE_TTL_SECONDS)
+lists = LRUCache(CATALOG_CACHE_MAX_LISTS, CATALOG_CACHE_TTL_SECONDS)
+# Bumped on every invalidation; a read that started under an older
+# generation must not store its (possibly pre-write) result
+generation = 0
+
+
+def invalidate_book(book_id: Optional[str] = None):
+    """Drop a book (if given) and every cached list that might contain it"""
+    global generation
+    generation += 1
+    if book_id is not None:
+        books.delete(book_id)
+    lists.clear()
+
+
+def metrics() -> dict:
+    return {"books": books.metrics(), "lists": lists.metrics()}
@@ -0,0 +1,82 @@
+"""
+CSV Import Parsing
+
+Turns the lines of a streamed CSV upload into row dicts keyed by the header.
+csv.reader finds record boundaries, so quoted fields may contain quotes,
+commas and line breaks. Lines are parsed in batches; a record still open at
+the end of a batch is carried over to the next one.
+
+Malformed input never aborts the import: an unterminated quoted field, or a
+record the csv module rejects (e.g. a field over csv.field_size_limit), is
+yielded as an exception in place of its row so the caller can report it.
+"""
+
+import csv
+from typing import List
+
+# Lines handed to csv.reader at a time, and the most lines one record
+# (a quoted field with line breaks) may span
+PARSE_BATCH_LINES = 1000
+MAX_RECORD_LINES = 1000
+
+# Appended as a line of its own to each batch: if csv.reader returns it as a
+# row, every record in the batch was complete; if an open quoted field
+# swallowed it, the last record continues in the next batch
+_END = "\ue000"
+
+
+def records(lines: List[str]) -> tuple:
+    """Parse newline-terminated lines; returns (rows, lines of an unfinished last record).
+
+    A record csv.reader rejects is returned as its csv.Error and parsing
+    resumes on the line after the error.
+    """
+    rows: list = []
+    offset = 0
+    while True:
+        reader = csv.reader([*lines[offset:], _END])
+        start = last_start = 0
+        try:
+            for row in reader:
+                if row == [_END]:
+                    return rows, []
+                rows.append(row)
+                last_start, start = start, reader.line_num
+        except csv.Error as e:
+            rows.append(e)
+            offset += reader.line_num
+            continue
+        return rows[:-1], lines[offset + last_start:]
+
+
+async def parsed(lines):
+    """Rows of an async iterable of lines (without line endings), as lists of strings"""
+    pending: List[str] = []
+    async for line in lines:
+        pending.append(line + "\n")
+        if len(pending) < PARSE_BATCH_LINES:
+            continue
+        rows, pending = records(pending)
+        for row in rows:
+            yield row
+        if len(pending) >= MAX_RECORD_LINES:
+            yield ValueError("Unterminated quoted field")
+            pending = []
+    rows, pending = records(pending)
+    for row in rows:
+        yield row
+    if pending:
+        yield ValueError("Unterminated quoted field")
+
+
+async def rows(lines):
+    """Data rows as {header: value} dicts (empty cells left out), or exceptions for malformed records"""
+    header = None
+    async for row in parsed(lines):
+        if isinstance(row, Exception):
+            yield row
+        elif header is None:
+            header = [h.strip() for h in row]
+        elif any(v.strip() for v in row):
+            # Empty cells fall back to the model defaults
+            yield {k: v for k, v in zip(header, row) if v != ""}
@@ -5,11 +5,14 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, IndexModel
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
+import base64
+import json
 import os
 from dotenv import load_dotenv
-from typing import Union, Optional, Dict, Any
+from typing import Union, Optional, Dict, Any, List, Tuple, AsyncIterator
 from pydantic import BaseModel
 
 # Load environment variables from .env file
@@ -17,13 +20,19 @@ load_dotenv()
 
 _client = None
 db = None
+# Async (Motor) client for request handlers; shares the server, not the pool
+_async_client = None
+async_db = None
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
+max_pool_size = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
 
 if database_url and database_name:
     _client = MongoClient(database_url)
     db = _client[database_name]
+    _async_client = AsyncIOMotorClient(database_url, maxPoolSize=max_pool_size)
+    async_db = _async_client[database_name]
 
 # Helper functions for common database operations
 def _ensure_db():
@@ -31,28 +40,43 @@ def _ensure_db():
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
 
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    _ensure_db()
+def _ensure_async_db():
+    if async_db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
 
+def utc_now() -> datetime:
+    """Current time as MongoDB stores and returns it: naive UTC, millisecond precision"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def prepare_document(data: Union[BaseModel, dict]) -> dict:
+    """Build the dict to insert, stamped with created_at/updated_at"""
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
         data_dict = data.model_dump()
     else:
         data_dict = data.copy()
 
-    now = datetime.now(timezone.utc)
+    # Stamped as stored, so the inserted document echoes what later reads return
+    now = utc_now()
     data_dict['created_at'] = now
     data_dict['updated_at'] = now
+    return data_dict
 
-    result = db[collection_name].insert_one(data_dict)
+
+def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    _ensure_db()
+    result = db[collection_name].insert_one(prepare_document(data))
     return str(result.inserted_id)
 
 
-def get_documents(collection_name: str, filter_dict: Optional[dict] = None, limit: Optional[int] = None, sort: Optional[list] = None):
+def get_documents(collection_name: str, filter_dict: Optional[dict] = None, limit: Optional[int] = None, sort: Optional[list] = None, projection: Optional[dict] = None):
     """Get documents from collection"""
     _ensure_db()
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db[collection_name].find(filter_dict or {}, projection)
     if sort:
         cursor = cursor.sort(sort)
     if limit:
@@ -60,12 +84,54 @@ def get_documents(collection_name: str, filter_dict: Optional[dict] = None, limi
     return list(cursor)
 
 
-def get_document_by_id(collection_name: str, doc_id: str) -> Optional[Dict[str, Any]]:
+# Keyset pagination: newest first, ties on created_at broken by _id.
+# Backed by the (created_at desc, _id desc) compound index so every page is a
+# bounded index range scan instead of a skip over all previous pages.
+PAGE_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Build an opaque cursor pointing just past the given document"""
+    payload = json.dumps([doc["created_at"].isoformat(), str(doc["_id"])])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, Any]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    from bson import ObjectId
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _keyset_filter(filter_dict: Optional[dict], cursor: Optional[str]) -> dict:
+    # Cursors are only meaningful together with PAGE_SORT
+    if not cursor:
+        return filter_dict or {}
+    created_at, oid = decode_cursor(cursor)
+    after = {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": oid}},
+    ]}
+    return {"$and": [filter_dict, after]} if filter_dict else after
+
+
+def _page_projection(projection: Optional[dict]) -> Optional[dict]:
+    # The next-page cursor is built from created_at, so inclusion projections keep it
+    if projection and any(projection.values()):
+        return {**projection, "created_at": 1}
+    return projection
+
+
+def get_document_by_id(collection_name: str, doc_id: str, projection: Optional[dict] = None) -> Optional[Dict[str, Any]]:
     """Get a single document by _id string"""
     _ensure_db()
     from bson import ObjectId
     try:
-        return db[collection_name].find_one({"_id": ObjectId(doc_id)})
+        return db[collection_name].find_one({"_id": ObjectId(doc_id)}, projection)
     except Exception:
         return None
 
@@ -75,7 +141,7 @@ def update_document(collection_name: str, doc_id: str, data: dict) -> bool:
     _ensure_db()
     from bson import ObjectId
     data = data.copy()
-    data['updated_at'] = datetime.now(timezone.utc)
+    data['updated_at'] = utc_now()
     res = db[collection_name].update_one({"_id": ObjectId(doc_id)}, {"$set": data})
     return res.modified_count > 0
 
@@ -86,3 +152,164 @@ def delete_document(collection_name: str, doc_id: str) -> bool:
     from bson import ObjectId
     res = db[collection_name].delete_one({"_id": ObjectId(doc_id)})
     return res.deleted_count > 0
+
+
+def ensure_indexes(registry: Dict[str, List[dict]], create: bool = True, drop_extra: bool = False) -> Dict[str, Dict[str, list]]:
+    """Compare (and optionally apply) an index registry; returns a per-collection report"""
+    _ensure_db()
+    report = {}
+    for collection_name, specs in registry.items():
+        collection = db[collection_name]
+        existing = {ix["name"]: ix for ix in collection.list_indexes()}
+        wanted = {spec["name"]: spec for spec in specs}
+        entry = {"missing": [], "created": [], "conflicting": [], "ttl_changed": [], "ttl_updated": [], "extra": [], "dropped": [], "errors": []}
+
+        for name, spec in wanted.items():
+            current = existing.get(name)
+            if current is None:
+                entry["missing"].append(name)
+            elif list(current["key"].items()) != [tuple(k) for k in spec["keys"]] or bool(current.get("unique")) != bool(spec.get("unique")):
+                entry["conflicting"].append(name)
+            elif current.get("expireAfterSeconds") != spec.get("expireAfterSeconds") and "expireAfterSeconds" in spec:
+                entry["ttl_changed"].append(name)
+        entry["extra"] = [name for name in existing if name != "_id_" and name not in wanted]
+
+        if create and entry["missing"]:
+            try:
+                collection.create_indexes([IndexModel(**wanted[name]) for name in entry["missing"]])
+                entry["created"] = entry["missing"]
+                entry["missing"] = []
+            except Exception as e:
+                entry["errors"].append(str(e))
+        if create:
+            # A TTL can be changed in place, without rebuilding the index
+            for name in entry["ttl_changed"]:
+                try:
+                    db.command("collMod", collection_name, index={"name": name, "expireAfterSeconds": wanted[name]["expireAfterSeconds"]})
+                    entry["ttl_updated"].append(name)
+                except Exception as e:
+                    entry["errors"].append(str(e))
+            entry["ttl_changed"] = [name for name in entry["ttl_changed"] if name not in entry["ttl_updated"]]
+        if drop_extra:
+            for name in entry["extra"]:
+                collection.drop_index(name)
+                entry["dropped"].append(name)
+        report[collection_name] = entry
+    return report
+
+
+# Async equivalents for use inside `async def` endpoints. They keep the
+# event loop free while waiting on Mongo, so request concurrency is bounded
+# by the connection pool (MONGO_MAX_POOL_SIZE) rather than by threads.
+def get_async_collection(collection_name: str):
+    """Get a Motor collection, raising if the database is not configured"""
+    _ensure_async_db()
+    return async_db[collection_name]
+
+
+async def create_document_async(collection_name: str, data: Union[BaseModel, dict]) -> Dict[str, Any]:
+    """Insert a single document with timestamp and return it with its _id"""
+    data_dict = prepare_document(data)
+    result = await get_async_collection(collection_name).insert_one(data_dict)
+    data_dict['_id'] = result.inserted_id
+    return data_dict
+
+
+async def create_documents_async(collection_name: str, items: List[Union[BaseModel, dict]], ordered: bool = False) -> Tuple[int, List[Tuple[int, str]]]:
+    """Insert many documents with timestamps in one insert_many; returns (inserted_count, [(index, error)])"""
+    from pymongo.errors import BulkWriteError
+    docs = [prepare_document(item) for item in items]
+    if not docs:
+        return 0, []
+    try:
+        result = await get_async_collection(collection_name).insert_many(docs, ordered=ordered)
+        return len(result.inserted_ids), []
+    except BulkWriteError as e:
+        errors = [(err["index"], err.get("errmsg", "write error")) for err in e.details.get("writeErrors", [])]
+        return e.details.get("nInserted", 0), errors
+
+
+async def get_documents_async(collection_name: str, filter_dict: Optional[dict] = None, limit: Optional[int] = None, sort: Optional[list] = None, projection: Optional[dict] = None):
+    """Get documents from collection"""
+    cursor = get_async_collection(collection_name).find(filter_dict or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return await cursor.to_list(length=None)
+
+
+async def get_documents_page_async(collection_name: str, filter_dict: Optional[dict] = None, limit: int = 50, cursor: Optional[str] = None, projection: Optional[dict] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Get one page of documents (newest first) and the cursor for the next page"""
+    query = _keyset_filter(filter_dict, cursor)
+    # Fetch one extra document to know whether another page exists
+    docs = await get_async_collection(collection_name).find(query, _page_projection(projection)).sort(PAGE_SORT).limit(limit + 1).to_list(length=None)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+async def iter_documents_async(collection_name: str, filter_dict: Optional[dict] = None, batch_size: int = 500, cursor: Optional[str] = None, projection: Optional[dict] = None, sort: Optional[list] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Lazily iterate documents in page order (or `sort`), fetching batch_size per round trip"""
+    query = _keyset_filter(filter_dict, cursor)
+    docs = get_async_collection(collection_name).find(query, projection, batch_size=batch_size).sort(sort or PAGE_SORT)
+    try:
+        async for doc in docs:
+            yield doc
+    finally:
+        await docs.close()
+
+
+async def get_document_by_id_async(collection_name: str, doc_id: str, projection: Optional[dict] = None) -> Optional[Dict[str, Any]]:
+    """Get a single document by _id string"""
+    from bson import ObjectId
+    collection = get_async_collection(collection_name)
+    try:
+        return await collection.find_one({"_id": ObjectId(doc_id)}, projection)
+    except Exception:
+        return None
+
+
+async def update_document_async(collection_name: str, doc_id: str, data: dict) -> Optional[Dict[str, Any]]:
+    """Update a document by id with $set and updated_at; returns the updated document or None"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    try:
+        oid = ObjectId(doc_id)
+    except (InvalidId, TypeError):
+        return None
+    data = data.copy()
+    data['updated_at'] = utc_now()
+    return await get_async_collection(collection_name).find_one_and_update(
+        {"_id": oid}, {"$set": data}, return_document=ReturnDocument.AFTER
+    )
+
+
+async def update_document_with_previous_async(collection_name: str, doc_id: str, data: dict, extra_filter: Optional[dict] = None) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Update a document by id (and extra_filter) like update_document_async; returns (before, after) or (None, None)"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    try:
+        oid = ObjectId(doc_id)
+    except (InvalidId, TypeError):
+        return None, None
+    data = data.copy()
+    data['updated_at'] = utc_now()
+    before = await get_async_collection(collection_name).find_one_and_update(
+        {"_id": oid, **(extra_filter or {})}, {"$set": data}, return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return None, None
+    # Same round trip: the after-image is the before-image with the $set applied
+    return before, {**before, **data}
+
+
+async def delete_document_async(collection_name: str, doc_id: str) -> bool:
+    """Delete a document by id; False if it does not exist or the id is malformed"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    try:
+        oid = ObjectId(doc_id)
+    except (InvalidId, TypeError):
+        return False
+    res = await get_async_collection(collection_name).delete_one({"_id": oid})
+    return res.deleted_count > 0
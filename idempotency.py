@@ -0,0 +1,121 @@
+"""
+Idempotency Keys
+
+Replays the stored response for a repeated `Idempotency-Key` instead of
+executing the request again. The first request claims the key by inserting
+its record (the _id is unique); concurrent duplicates wait for that record to
+complete and then replay it. Records expire through the TTL index declared in
+schemas.INDEXES.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict
+
+import orjson
+from fastapi.responses import Response
+from pymongo.errors import DuplicateKeyError
+
+from database import get_async_collection
+from responses import RawJSONResponse
+
+IDEMPOTENCY_COLLECTION = "idempotency"
+MAX_KEY_LENGTH = 255
+# How long a duplicate waits for the first request before giving up
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# An in-progress claim older than this is assumed abandoned (worker crash)
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a different request payload"""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with this key is still running"""
+
+
+# Same-process owners, so local duplicates wake up without polling
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def fingerprint(payload) -> str:
+    """Stable hash of a request payload (pydantic model or plain data)"""
+    if hasattr(payload, "model_dump"):
+        payload = payload.model_dump(mode="json")
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+async def _claim(record_id: str, request_hash: str) -> bool:
+    collection = get_async_collection(IDEMPOTENCY_COLLECTION)
+    now = datetime.now(timezone.utc)
+    try:
+        await collection.insert_one({
+            "_id": record_id,
+            "fingerprint": request_hash,
+            "state": "in_progress",
+            "created_at": now,
+            "locked_at": now,
+        })
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def _take_over(record: dict) -> bool:
+    collection = get_async_collection(IDEMPOTENCY_COLLECTION)
+    res = await collection.update_one(
+        {"_id": record["_id"], "state": "in_progress", "locked_at": record["locked_at"]},
+        {"$set": {"locked_at": datetime.now(timezone.utc)}},
+    )
+    return res.modified_count == 1
+
+
+async def run(scope: str, key: str, request_hash: str, handler: Callable[[], Awaitable[Response]]) -> Response:
+    """Execute handler once per (scope, key); duplicates get the stored response"""
+    collection = get_async_collection(IDEMPOTENCY_COLLECTION)
+    record_id = f"{scope}:{key}"
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.01
+
+    while not await _claim(record_id, request_hash):
+        record = await collection.find_one({"_id": record_id})
+        if record is None:
+            # The previous attempt failed and released the key
+            continue
+        if record["fingerprint"] != request_hash:
+            raise IdempotencyKeyReused()
+        if record["state"] == "done":
+            return RawJSONResponse(record["body"], status_code=record["status_code"], headers={"Idempotent-Replayed": "true"})
+        locked_at = record["locked_at"].replace(tzinfo=timezone.utc)
+        if (datetime.now(timezone.utc) - locked_at).total_seconds() > IDEMPOTENCY_LEASE_SECONDS and await _take_over(record):
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise IdempotencyInProgress()
+        owner = _inflight.get(record_id)
+        if owner is not None:
+            await asyncio.wait({owner}, timeout=remaining)
+        else:
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.25)
+
+    done = asyncio.get_running_loop().create_future()
+    _inflight[record_id] = done
+    try:
+        response = await handler()
+    except BaseException:
+        await collection.delete_one({"_id": record_id})
+        raise
+    else:
+        await collection.update_one(
+            {"_id": record_id},
+            {"$set": {"state": "done", "status_code": response.status_code, "body": bytes(response.body)}},
+        )
+        return response
+    finally:
+        _inflight.pop(record_id, None)
+        done.set_result(None)
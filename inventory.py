@@ -0,0 +1,62 @@
+"""
+Stock Reservation
+
+Takes stock for every line of an order or for none of them. Each line is one
+conditional `$inc: -qty` guarded by `stock >= qty`, sent concurrently; the
+per-document atomicity of those updates means concurrent checkouts of the
+same title never oversell and need no global lock. When any line misses, the
+lines that were applied (known from each update's own result) are put back.
+
+Nothing is upserted, so a book deleted in the meantime is never recreated.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Hashable, List
+
+
+class UnknownBooks(Exception):
+    """Some books of the order do not exist"""
+
+    def __init__(self, book_ids: List[Hashable]):
+        super().__init__(book_ids)
+        self.book_ids = book_ids
+
+
+class InsufficientStock(Exception):
+    """A book does not have enough stock left"""
+
+    def __init__(self, book_id: Hashable):
+        super().__init__(book_id)
+        self.book_id = book_id
+
+
+def _stock_update(sign: int, qty: int) -> dict:
+    return {"$inc": {"stock": sign * qty}, "$set": {"updated_at": datetime.now(timezone.utc)}}
+
+
+async def reserve(collection, quantities: Dict[Hashable, int]):
+    """Take `qty` of each book, or raise having taken nothing (UnknownBooks, InsufficientStock)"""
+    lines = list(quantities.items())
+    results = await asyncio.gather(*(
+        collection.update_one({"_id": book_id, "stock": {"$gte": qty}}, _stock_update(-1, qty))
+        for book_id, qty in lines
+    ), return_exceptions=True)
+    taken = [
+        (book_id, qty) for (book_id, qty), res in zip(lines, results)
+        if not isinstance(res, BaseException) and res.matched_count
+    ]
+    if len(taken) == len(lines):
+        return
+
+    # Put back exactly the lines that were applied
+    await asyncio.gather(*(collection.update_one({"_id": book_id}, _stock_update(1, qty)) for book_id, qty in taken))
+    errors = [res for res in results if isinstance(res, BaseException)]
+    if errors:
+        raise errors[0]
+    missed = [book_id for (book_id, _), res in zip(lines, results) if not res.matched_count]
+    existing = {doc["_id"] async for doc in collection.find({"_id": {"$in": missed}}, {"_id": 1})}
+    unknown = [book_id for book_id in missed if book_id not in existing]
+    if unknown:
+        raise UnknownBooks(unknown)
+    raise InsufficientStock(missed[0])
@@ -1,25 +1,98 @@
+import asyncio
+import csv
+import hashlib
+import io
+import logging
+import math
 import os
-from datetime import datetime
-from typing import List, Optional
+import time
+import zlib
+from collections import defaultdict
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends
+import orjson
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from pydantic import BaseModel
-from passlib.context import CryptContext
+from pydantic import BaseModel, Field, ValidationError
 from jose import jwt
+from pymongo import UpdateOne
 
-from database import db, create_document, get_documents, get_document_by_id, update_document, delete_document
-from schemas import AdminUser, Book, Order, OrderItem
+from database import (
+    db, create_document, decode_cursor, ensure_indexes, get_async_collection,
+    create_document_async, create_documents_async, get_documents_page_async, iter_documents_async,
+    get_document_by_id_async, update_document_async, update_document_with_previous_async,
+    delete_document_async, utc_now,
+)
+import catalog_cache
+import csv_import
+import idempotency
+import inventory
+import passwords
+import rollups
+from search_index import CatalogSearch, tokenize
+from singleflight import SingleFlight
+from responses import MongoJSONResponse, RawJSONResponse, dumps, to_public
+from schemas import AdminUser, Book, Order, OrderItem, BOOK_TOMBSTONE_TTL_SECONDS, INDEXES
+from write_buffer import GroupCommitBuffer
 
 # Security settings
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
-# Use pbkdf2_sha256 to avoid bcrypt backend issues in some environments
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# List endpoint paging
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Build missing indexes from schemas.INDEXES on startup (also: python manage.py indexes)
+AUTO_CREATE_INDEXES = os.getenv("AUTO_CREATE_INDEXES", "true").lower() in ("1", "true", "yes")
+# Bulk catalog import
+DEFAULT_IMPORT_BATCH = 1000
+MAX_IMPORT_BATCH = 10000
+IMPORT_MAX_REPORTED_ERRORS = 1000
+# Bulk catalog export (oldest change first, so an interrupted sync can resume);
+# delta exports end with a {"id", "deleted": true} row per deleted book
+EXPORT_SORT = [("updated_at", 1), ("_id", 1)]
+EXPORT_CSV_COLUMNS = ["id", *Book.model_fields, "created_at", "updated_at", "deleted"]
+DEFAULT_EXPORT_BATCH = 5000
+# Optional group commit for order inserts during bursts
+ORDER_GROUP_COMMIT = os.getenv("ORDER_GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+ORDER_GROUP_COMMIT_WINDOW_MS = float(os.getenv("ORDER_GROUP_COMMIT_WINDOW_MS", "2"))
+ORDER_GROUP_COMMIT_MAX_DOCS = int(os.getenv("ORDER_GROUP_COMMIT_MAX_DOCS", "100"))
+# Materialized dashboard counters, corrected periodically from the source collections
+STATS_RECONCILE_SECONDS = int(os.getenv("STATS_RECONCILE_SECONDS", "300"))
+DASHBOARD_STATS_ID = "dashboard"
+# Serve a dashboard stats read this recent while it is refreshed (0 disables)
+STATS_STALE_SECONDS = float(os.getenv("STATS_STALE_SECONDS", "1"))
+# In-process catalog search: delta sync interval, and how often (at most) and
+# past what share of stale postings the index is rebuilt from scratch
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "30"))
+SEARCH_REBUILD_SECONDS = float(os.getenv("SEARCH_REBUILD_SECONDS", "3600"))
+SEARCH_REBUILD_GARBAGE_RATIO = float(os.getenv("SEARCH_REBUILD_GARBAGE_RATIO", "0.25"))
+# Largest /admin/stats/timeseries response, in buckets
+MAX_TIMESERIES_BUCKETS = 10000
+# Streaming (NDJSON) list responses
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+DEFAULT_STREAM_BATCH = 500
+MAX_STREAM_BATCH = 10000
+# /books filters and facet counts
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "5"))
+PRICE_BAND_BOUNDARIES = [0, 10, 25, 50, 100]
+MAX_AUTHOR_FACETS = 20
+# Largest POST /books/batch-get request, in ids
+MAX_BATCH_GET_IDS = 5000
+# Largest POST /orders/status/bulk request, in ids
+MAX_BULK_STATUS_IDS = 1000
 
-app = FastAPI()
+app = FastAPI(default_response_class=MongoJSONResponse)
+logger = logging.getLogger(__name__)
+# Concurrent identical reads share one DB call
+stats_flight = SingleFlight(stale_seconds=STATS_STALE_SECONDS)
+catalog_flight = SingleFlight()
+catalog_search = CatalogSearch()
+order_buffer = GroupCommitBuffer("order", ORDER_GROUP_COMMIT_WINDOW_MS, ORDER_GROUP_COMMIT_MAX_DOCS) if ORDER_GROUP_COMMIT else None
 
 app.add_middleware(
     CORSMiddleware,
@@ -50,10 +123,155 @@ def _admin_collection():
     return db["adminuser"]
 
 def _book_collection():
-    return db["book"]
+    return get_async_collection("book")
 
 def _order_collection():
-    return db["order"]
+    return get_async_collection("order")
+
+def _stats_collection():
+    return get_async_collection("stats")
+
+def _book_tombstone_collection():
+    return get_async_collection("book_tombstone")
+
+
+def _fields_projection(fields: Optional[str], model) -> Optional[dict]:
+    """Turn a `fields=a,b` query value into a Mongo inclusion projection"""
+    if not fields:
+        return None
+    allowed = set(model.model_fields) | {"id", "created_at", "updated_at"}
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # _id is always returned (as `id`); an empty inclusion would mean "everything"
+    return {n: 1 for n in names if n != "id"} or {"_id": 1}
+
+
+async def _list_page_body(collection_name: str, limit: int, cursor: Optional[str], projection: Optional[dict] = None, filter_dict: Optional[dict] = None, facets=None) -> bytes:
+    """One page as JSON bytes; `facets` is an optional coroutine run alongside the page query"""
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        if facets is not None:
+            facets.close()
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    page = get_documents_page_async(collection_name, filter_dict=filter_dict, limit=limit, cursor=cursor, projection=projection)
+    if facets is None:
+        docs, next_cursor = await page
+        return dumps({"items": [to_public(d) for d in docs], "next_cursor": next_cursor})
+    (docs, next_cursor), facet_counts = await asyncio.gather(page, facets)
+    return dumps({"items": [to_public(d) for d in docs], "next_cursor": next_cursor, "facets": facet_counts})
+
+
+_background: set = set()
+
+def _spawn(coro):
+    """Run a fire-and-forget coroutine, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+def _wants_stream(request: Request, stream: bool) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _ndjson_lines(collection_name: str, batch_size: int, cursor: Optional[str], projection: Optional[dict], filter_dict: Optional[dict] = None):
+    # One chunk per cursor batch: memory stays at one batch regardless of
+    # collection size and the first chunk goes out after the first round trip.
+    chunk = []
+    async for doc in iter_documents_async(collection_name, filter_dict, batch_size=batch_size, cursor=cursor, projection=projection):
+        chunk.append(dumps(to_public(doc), option=orjson.OPT_APPEND_NEWLINE))
+        if len(chunk) >= batch_size:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _stream_list(collection_name: str, batch_size: int, cursor: Optional[str], projection: Optional[dict] = None, filter_dict: Optional[dict] = None) -> StreamingResponse:
+    # Streams every document after `cursor`; `limit` only applies to pages
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return StreamingResponse(_ndjson_lines(collection_name, batch_size, cursor, projection, filter_dict), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def _idempotent(scope: str, key: Optional[str], payload, handler):
+    """Run handler at most once per Idempotency-Key (no key: just run it)"""
+    if not key:
+        return await handler()
+    if len(key) > idempotency.MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    try:
+        return await idempotency.run(scope, key, idempotency.fingerprint(payload), handler)
+    except idempotency.IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    except idempotency.IdempotencyInProgress:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress", headers={"Retry-After": "1"})
+
+
+def _epoch_ms(ts: datetime) -> int:
+    # PyMongo returns naive UTC datetimes
+    return int(ts.replace(tzinfo=ts.tzinfo or timezone.utc).timestamp() * 1000)
+
+
+def _validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    # no-cache: clients may store the body but must revalidate before reuse
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=last_modified.tzinfo or timezone.utc), usegmt=True)
+    return headers
+
+
+def _is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, and If-None-Match takes precedence over If-Modified-Since
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have second precision
+        return _epoch_ms(last_modified) // 1000 <= int(since.timestamp())
+    return False
+
+
+def _not_modified_response(etag: str, last_modified: Optional[datetime]) -> Response:
+    return Response(status_code=304, headers=_validator_headers(etag, last_modified))
+
+
+def _conditional_response(request: Request, body: bytes, etag: str, last_modified: Optional[datetime]) -> Response:
+    if _is_not_modified(request, etag, last_modified):
+        return _not_modified_response(etag, last_modified)
+    return RawJSONResponse(body, headers=_validator_headers(etag, last_modified))
+
+
+async def _list_validators(collection_name: str, request: Request):
+    """ETag/Last-Modified for a list query from collection metadata only.
+
+    (newest updated_at, document count) changes on every insert, update and
+    delete; both come from an index edge and collection metadata, so a list
+    can be revalidated without reading its documents.
+    """
+    collection = get_async_collection(collection_name)
+    latest, count = await asyncio.gather(
+        collection.find_one({}, {"updated_at": 1}, sort=[("updated_at", -1)]),
+        collection.estimated_document_count(),
+    )
+    last_modified = latest.get("updated_at") if latest else None
+    version = _epoch_ms(last_modified) if last_modified else 0
+    query = hashlib.sha1(repr(sorted(request.query_params.multi_items())).encode()).hexdigest()[:16]
+    return f'W/"{collection_name}-{count}-{version}-{query}"', last_modified
 
 
 def create_access_token(data: dict) -> str:
@@ -76,12 +294,51 @@ async def ensure_admin_exists():
         default = AdminUser(
             name="Admin",
             email="admin@example.com",
-            password_hash=pwd_context.hash("admin123"),
+            password_hash=await passwords.hash_password("admin123"),
             role="admin",
         )
         create_document("adminuser", default)
 
 
+@app.on_event("startup")
+async def apply_indexes():
+    # Idempotent: only missing indexes are built; drift is logged, not dropped
+    if db is None:
+        return
+    report = ensure_indexes(INDEXES, create=AUTO_CREATE_INDEXES)
+    for collection_name, entry in report.items():
+        for kind in ("missing", "created", "conflicting", "ttl_changed", "ttl_updated", "extra", "errors"):
+            if entry[kind]:
+                logger.warning("Indexes on %s %s: %s", collection_name, kind, entry[kind])
+
+
+@app.on_event("startup")
+async def start_stats_reconciler():
+    if db is None:
+        return
+    app.state.stats_reconciler = asyncio.create_task(_stats_reconcile_loop())
+
+
+@app.on_event("startup")
+async def start_search_sync():
+    if db is None:
+        return
+    app.state.search_sync = asyncio.create_task(_search_sync_loop())
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for name in ("stats_reconciler", "search_sync"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_password_pool():
+    passwords.shutdown()
+
+
 # ------------------------- Basic Routes -----------------------
 @app.get("/")
 def root():
@@ -126,9 +383,15 @@ class LoginResponse(BaseModel):
     profile: AdminProfile
 
 @app.post("/auth/login", response_model=LoginResponse)
-def admin_login(payload: LoginRequest):
-    user = _admin_collection().find_one({"email": payload.email})
-    if not user or not pwd_context.verify(payload.password, user.get("password_hash", "")):
+async def admin_login(payload: LoginRequest):
+    user = await get_async_collection("adminuser").find_one({"email": payload.email})
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        valid = await passwords.verify_password(payload.password, user.get("password_hash", ""))
+    except passwords.PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Too many login attempts, retry shortly", headers={"Retry-After": "1"})
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     if not user.get("is_active", True):
         raise HTTPException(status_code=403, detail="User is inactive")
@@ -140,6 +403,17 @@ def admin_login(payload: LoginRequest):
     return LoginResponse(token=token, profile=profile)
 
 
+# ------------------------- Metrics ----------------------------
+@app.get("/admin/metrics")
+async def get_metrics():
+    return {
+        "password_pool": passwords.metrics(),
+        "catalog_cache": catalog_cache.metrics(),
+        "order_group_commit": order_buffer.metrics() if order_buffer else None,
+        "single_flight": {"stats": stats_flight.metrics(), "catalog": catalog_flight.metrics()},
+    }
+
+
 # ------------------------- Dashboard Widgets ------------------
 class DashboardStats(BaseModel):
     total_books: int
@@ -147,19 +421,135 @@ class DashboardStats(BaseModel):
     pending_orders: int
     revenue: float
 
-@app.get("/admin/stats", response_model=DashboardStats)
-def get_admin_stats():
-    total_books = _book_collection().count_documents({})
-    total_orders = _order_collection().count_documents({})
-    pending_orders = _order_collection().count_documents({"status": "pending"})
+def _order_contribution(order: dict) -> dict:
+    """Dashboard counters an order contributes in its current status"""
+    status = order.get("status")
+    return {
+        "pending_orders": 1 if status == "pending" else 0,
+        "revenue": 0.0 if status == "cancelled" else float(order.get("total_amount", 0)),
+    }
+
+
+async def _bump_stats(**deltas):
+    deltas = {k: v for k, v in deltas.items() if v}
+    if deltas:
+        await _stats_collection().update_one({"_id": DASHBOARD_STATS_ID}, {"$inc": deltas}, upsert=True)
+
+
+async def _record_orders(created=(), transitions=()):
+    """Apply dashboard counter and rollup deltas for new orders and (before, after) status changes"""
+    dashboard = defaultdict(int)
+    deltas = rollups.RollupDeltas()
+    for order in created:
+        dashboard["total_orders"] += 1
+        for k, v in _order_contribution(order).items():
+            dashboard[k] += v
+        deltas.add(order["created_at"], {"orders": 1, **rollups.order_increments(order)})
+    for before, after in transitions:
+        old, new = _order_contribution(before), _order_contribution(after)
+        for k in new:
+            dashboard[k] += new[k] - old[k]
+        deltas.add(before["created_at"], rollups.order_increments(before, -1))
+        deltas.add(before["created_at"], rollups.order_increments(after))
+    # Counters and buckets share the stats collection: one round trip for all
+    ops = deltas.operations()
+    dashboard = {k: v for k, v in dashboard.items() if v}
+    if dashboard:
+        ops.append(UpdateOne({"_id": DASHBOARD_STATS_ID}, {"$inc": dashboard}, upsert=True))
+    if ops:
+        await _stats_collection().bulk_write(ops, ordered=False)
+
+
+# One pass over order: count and revenue per status
+DASHBOARD_STATS_PIPELINE = [
+    {"$group": {"_id": "$status", "count": {"$sum": 1}, "revenue": {"$sum": "$total_amount"}}},
+]
+
+
+async def _compute_dashboard_stats() -> dict:
+    # Book total comes from collection metadata instead of a count scan
+    total_books, groups = await asyncio.gather(
+        _book_collection().estimated_document_count(),
+        _order_collection().aggregate(DASHBOARD_STATS_PIPELINE).to_list(length=None),
+    )
+    total_orders = sum(g["count"] for g in groups)
+    pending_orders = sum(g["count"] for g in groups if g["_id"] == "pending")
     # revenue sum of total_amount for orders with status not cancelled
-    pipeline = [
-        {"$match": {"status": {"$ne": "cancelled"}}},
-        {"$group": {"_id": None, "sum": {"$sum": "$total_amount"}}}
-    ]
-    agg = list(_order_collection().aggregate(pipeline))
-    revenue = float(agg[0]["sum"]) if agg else 0.0
-    return DashboardStats(total_books=total_books, total_orders=total_orders, pending_orders=pending_orders, revenue=revenue)
+    revenue = float(sum(g["revenue"] for g in groups if g["_id"] != "cancelled"))
+    return {"total_books": total_books, "total_orders": total_orders, "pending_orders": pending_orders, "revenue": revenue}
+
+
+async def _reconcile_stats() -> dict:
+    # Increments that land while the recount runs can be overwritten; the
+    # next reconciliation corrects that drift.
+    stats = await _compute_dashboard_stats()
+    stats["reconciled_at"] = datetime.now(timezone.utc)
+    await _stats_collection().update_one({"_id": DASHBOARD_STATS_ID}, {"$set": stats}, upsert=True)
+    return stats
+
+
+async def _stats_reconcile_loop():
+    while True:
+        try:
+            await _reconcile_stats()
+        except Exception:
+            logger.exception("Dashboard stats reconciliation failed")
+        await asyncio.sleep(STATS_RECONCILE_SECONDS)
+
+
+async def _load_dashboard_stats() -> dict:
+    doc = await _stats_collection().find_one({"_id": DASHBOARD_STATS_ID})
+    # Counters are only trustworthy once seeded by a full recount
+    if not doc or "reconciled_at" not in doc:
+        doc = await _reconcile_stats()
+    return doc
+
+
+@app.get("/admin/stats", response_model=DashboardStats)
+async def get_admin_stats():
+    doc = await stats_flight.do(DASHBOARD_STATS_ID, _load_dashboard_stats)
+    return DashboardStats(
+        total_books=doc.get("total_books", 0),
+        total_orders=doc.get("total_orders", 0),
+        pending_orders=doc.get("pending_orders", 0),
+        revenue=doc.get("revenue", 0.0),
+    )
+
+
+class RollupPoint(BaseModel):
+    bucket: datetime
+    orders: int
+    revenue: float
+    status: Dict[str, int]
+
+@app.get("/admin/stats/timeseries", response_model=List[RollupPoint])
+async def get_stats_timeseries(
+    from_: datetime = Query(..., alias="from"),
+    to: Optional[datetime] = None,
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+):
+    start = rollups.bucket_start(from_, granularity)
+    end = rollups.to_naive_utc(to or datetime.now(timezone.utc))
+    if end <= start:
+        raise HTTPException(status_code=400, detail="`to` must be after `from`")
+    step = rollups.GRANULARITIES[granularity]
+    if math.ceil((end - start) / step) > MAX_TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail="Range too large for this granularity")
+    docs = await _stats_collection().find({"granularity": granularity, "bucket": {"$gte": start, "$lt": end}}).to_list(length=None)
+    by_bucket = {d["bucket"]: d for d in docs}
+    # Zero-fill so charts get a point for every bucket in the range
+    points = []
+    bucket = start
+    while bucket < end:
+        doc = by_bucket.get(bucket, {})
+        points.append(RollupPoint(
+            bucket=bucket,
+            orders=doc.get("orders", 0),
+            revenue=doc.get("revenue", 0.0),
+            status={k: v for k, v in doc.get("status", {}).items() if v},
+        ))
+        bucket += step
+    return points
 
 
 # ------------------------- Books CRUD -------------------------
@@ -174,91 +564,679 @@ class BookUpdate(BaseModel):
     description: Optional[str] = None
     cover_url: Optional[str] = None
 
+def _match_all(conditions: List[dict]) -> dict:
+    if not conditions:
+        return {}
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def _book_filter_clauses(author: Optional[str], min_price: Optional[float], max_price: Optional[float], in_stock: Optional[bool], low_stock: bool) -> Dict[str, List[dict]]:
+    """/books filter conditions grouped by facet, so each facet can ignore its own filter"""
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price must not exceed max_price")
+    clauses: Dict[str, List[dict]] = {"author": [], "price": [], "stock": []}
+    if author:
+        clauses["author"].append({"author": author})
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    if price:
+        clauses["price"].append({"price": price})
+    if in_stock is not None:
+        clauses["stock"].append({"stock": {"$gt": 0}} if in_stock else {"stock": {"$lte": 0}})
+    if low_stock:
+        clauses["stock"].append({"stock": {"$gt": 0, "$lte": LOW_STOCK_THRESHOLD}})
+    return clauses
+
+
+async def _book_facets(clauses: Dict[str, List[dict]]) -> dict:
+    """Author and price band counts in one aggregation.
+
+    Each facet applies every filter except its own, so picking an author
+    still shows the counts for the other authors.
+    """
+    bands = PRICE_BAND_BOUNDARIES
+    pipeline = [
+        {"$match": _match_all(clauses["stock"])},
+        {"$facet": {
+            "authors": [
+                {"$match": _match_all(clauses["price"])},
+                {"$sortByCount": "$author"},
+                {"$limit": MAX_AUTHOR_FACETS},
+            ],
+            "price_bands": [
+                {"$match": _match_all(clauses["author"])},
+                # Prices at or above the last boundary land in the open-ended top band
+                {"$bucket": {"groupBy": "$price", "boundaries": bands, "default": bands[-1]}},
+            ],
+        }},
+    ]
+    result = await _book_collection().aggregate(pipeline).to_list(length=1)
+    counts = result[0] if result else {"authors": [], "price_bands": []}
+    band_counts = {b["_id"]: b["count"] for b in counts["price_bands"]}
+    return {
+        "authors": [{"author": a["_id"], "count": a["count"]} for a in counts["authors"]],
+        "price_bands": [
+            {"min": low, "max": bands[i + 1] if i + 1 < len(bands) else None, "count": band_counts.get(low, 0)}
+            for i, low in enumerate(bands)
+        ],
+    }
+
+
 @app.get("/books")
-def list_books():
-    books = get_documents("book", sort=[["created_at", -1]])
-    for b in books:
-        b["id"] = str(b.pop("_id"))
-    return books
+async def list_books(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    batch_size: int = Query(DEFAULT_STREAM_BATCH, ge=1, le=MAX_STREAM_BATCH),
+    fields: Optional[str] = None,
+    author: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: Optional[bool] = None,
+    low_stock: bool = False,
+    facets: bool = False,
+):
+    projection = _fields_projection(fields, Book)
+    clauses = _book_filter_clauses(author, min_price, max_price, in_stock, low_stock)
+    filter_dict = _match_all(clauses["author"] + clauses["price"] + clauses["stock"]) or None
+    if _wants_stream(request, stream):
+        return _stream_list("book", batch_size, cursor, projection, filter_dict)
+    key = ("page", limit, cursor, fields, author, min_price, max_price, in_stock, low_stock, facets)
+    cached = catalog_cache.lists.get(key)
+    if cached is None:
+        async def load():
+            # Body and validators come from the same flight, so a caller joining a
+            # flight never pairs an older body with newer validators
+            generation = catalog_cache.generation
+            # Validators are read before the page so they never claim newer data than the body
+            etag, last_modified = await _list_validators("book", request)
+            body = await _list_page_body(
+                "book", limit, cursor, projection, filter_dict, _book_facets(clauses) if facets else None,
+            )
+            page = (body, etag, last_modified)
+            if generation == catalog_cache.generation:
+                catalog_cache.lists.set(key, page)
+            return page
+        cached = await catalog_flight.do(key, load)
+    return _conditional_response(request, *cached)
+
+async def _search_sync_loop():
+    last_rebuild = None
+    while True:
+        try:
+            if last_rebuild is None or (
+                time.monotonic() - last_rebuild >= SEARCH_REBUILD_SECONDS
+                and catalog_search.index.garbage_ratio() >= SEARCH_REBUILD_GARBAGE_RATIO
+            ):
+                await catalog_search.rebuild(_book_collection())
+                last_rebuild = time.monotonic()
+            else:
+                await catalog_search.refresh(_book_collection(), _book_tombstone_collection())
+        except Exception:
+            logger.exception("Catalog search sync failed")
+        await asyncio.sleep(SEARCH_REFRESH_SECONDS)
+
+async def _create_book(payload: BookCreate):
+    doc = await create_document_async("book", payload)
+    catalog_cache.invalidate_book()
+    catalog_search.add_book(doc)
+    try:
+        await _bump_stats(total_books=1)
+    except Exception:
+        # The book exists, so this must not fail the request (and release its
+        # Idempotency-Key for a duplicate retry); the stats reconciler corrects the counter
+        logger.exception("Counting new book %s failed", doc["_id"])
+    return MongoJSONResponse(to_public(doc))
 
 @app.post("/books")
-def create_book(payload: BookCreate):
-    new_id = create_document("book", payload)
-    doc = get_document_by_id("book", new_id)
-    doc["id"] = str(doc.pop("_id"))
-    return doc
+async def create_book(payload: BookCreate, idempotency_key: Optional[str] = Header(None)):
+    return await _idempotent("POST /books", idempotency_key, payload, lambda: _create_book(payload))
 
-@app.get("/books/{book_id}")
-def get_book(book_id: str):
-    doc = get_document_by_id("book", book_id)
+async def _request_lines(request: Request):
+    # Split the streamed body into lines without buffering the whole upload
+    pending = b""
+    first = True
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            text = line.decode("utf-8").rstrip("\r")
+            if first:
+                text, first = text.lstrip("\ufeff"), False
+            yield text
+    if pending:
+        text = pending.decode("utf-8").rstrip("\r")
+        yield text.lstrip("\ufeff") if first else text
+
+
+async def _jsonl_rows(lines):
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield e
+
+
+class ImportReport(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[dict] = []
+    errors_truncated: bool = False
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+
+    def add_error(self, row: int, error):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+        else:
+            self.errors_truncated = True
+
+
+@app.post("/books/import", response_model=ImportReport)
+async def import_books(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(jsonl|csv)$"),
+    batch_size: int = Query(DEFAULT_IMPORT_BATCH, ge=1, le=MAX_IMPORT_BATCH),
+):
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "jsonl"
+    rows = csv_import.rows(_request_lines(request)) if format == "csv" else _jsonl_rows(_request_lines(request))
+    report = ImportReport()
+    started = time.perf_counter()
+    batch: List[tuple] = []
+
+    async def flush():
+        inserted, errors = await create_documents_async("book", [book for _, book in batch], ordered=False)
+        report.inserted += inserted
+        for index, message in errors:
+            report.add_error(batch[index][0], message)
+        batch.clear()
+
+    try:
+        async for row in rows:
+            report.received += 1
+            if isinstance(row, Exception):
+                report.add_error(report.received, str(row))
+                continue
+            try:
+                batch.append((report.received, Book.model_validate(row)))
+            except ValidationError as e:
+                report.add_error(report.received, e.errors(include_url=False, include_input=False))
+                continue
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+    finally:
+        if report.inserted:
+            catalog_cache.invalidate_book()
+            await _bump_stats(total_books=report.inserted)
+            # Imported rows carry fresh updated_at stamps, so a refresh picks them up
+            _spawn(catalog_search.refresh(_book_collection(), _book_tombstone_collection()))
+
+    report.elapsed_seconds = round(time.perf_counter() - started, 3)
+    report.rows_per_second = round(report.received / report.elapsed_seconds, 1) if report.elapsed_seconds else 0.0
+    return report
+
+def _csv_line(doc: dict) -> str:
+    out = io.StringIO()
+    row = [doc.get(col) for col in EXPORT_CSV_COLUMNS]
+    csv.writer(out).writerow([
+        "" if v is None else "true" if v is True else v.isoformat() if isinstance(v, datetime) else v for v in row
+    ])
+    return out.getvalue()
+
+
+async def _export_rows(filter_dict: dict, batch_size: int, deleted_since: Optional[datetime]):
+    async for doc in iter_documents_async("book", filter_dict, batch_size=batch_size, sort=EXPORT_SORT):
+        yield to_public(doc)
+    if deleted_since is not None:
+        tombstones = _book_tombstone_collection().find(
+            {"deleted_at": {"$gt": deleted_since}}, {"_id": 1}, sort=[("deleted_at", 1)], batch_size=batch_size
+        )
+        async for doc in tombstones:
+            yield {"id": str(doc["_id"]), "deleted": True}
+
+
+async def _export_chunks(format: str, compress: bool, batch_size: int, filter_dict: dict, deleted_since: Optional[datetime] = None):
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    chunk = []
+
+    def encode(parts) -> bytes:
+        data = b"".join(parts)
+        return gz.compress(data) if gz else data
+
+    if format == "csv":
+        chunk.append(_csv_line({col: col for col in EXPORT_CSV_COLUMNS}).encode())
+    async for doc in _export_rows(filter_dict, batch_size, deleted_since):
+        chunk.append(_csv_line(doc).encode() if format == "csv" else dumps(doc, option=orjson.OPT_APPEND_NEWLINE))
+        if len(chunk) >= batch_size:
+            data = encode(chunk)
+            chunk = []
+            if data:
+                yield data
+    data = encode(chunk)
+    if gz:
+        data += gz.flush()
+    if data:
+        yield data
+
+
+@app.get("/books/export")
+async def export_books(
+    format: str = Query("jsonl", pattern="^(jsonl|csv)$"),
+    gzip: bool = False,
+    updated_since: Optional[datetime] = None,
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH, ge=1, le=MAX_STREAM_BATCH),
+):
+    filter_dict = {"updated_at": {"$gt": updated_since}} if updated_since else {}
+    if updated_since:
+        # Older deletions are no longer recorded, so such a delta would silently keep them
+        since = updated_since.replace(tzinfo=updated_since.tzinfo or timezone.utc)
+        if since < datetime.now(timezone.utc) - timedelta(seconds=BOOK_TOMBSTONE_TTL_SECONDS):
+            raise HTTPException(status_code=410, detail="updated_since is older than the deletion history; run a full export")
+    media_type = "text/csv" if format == "csv" else NDJSON_MEDIA_TYPE
+    headers = {"Content-Disposition": f'attachment; filename="books.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(_export_chunks(format, gzip, batch_size, filter_dict, updated_since), media_type=media_type, headers=headers)
+
+@app.get("/books/search")
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=100),
+    prefix: bool = True,
+):
+    if not catalog_search.ready:
+        raise HTTPException(status_code=503, detail="Search index is warming up", headers={"Retry-After": "5"})
+    started = time.perf_counter()
+    items = catalog_search.index.search(q, limit=limit, prefix=prefix)
+    # Nothing matched: offer a spelling correction instead of an empty page
+    did_you_mean = None if items else catalog_search.fuzzy.suggest(q)
+    return {"items": items, "did_you_mean": did_you_mean, "took_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+@app.get("/books/suggest")
+async def suggest_books(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(5, ge=1, le=50),
+):
+    if not catalog_search.ready:
+        raise HTTPException(status_code=503, detail="Search index is warming up", headers={"Retry-After": "5"})
+    started = time.perf_counter()
+    words = {word: [{"word": w, "similarity": sim} for w, sim in catalog_search.fuzzy.similar(word, limit=limit)] for word in tokenize(q)}
+    did_you_mean = catalog_search.fuzzy.suggest(q)
+    items = catalog_search.index.search(did_you_mean or q, limit=limit, prefix=False)
+    return {"did_you_mean": did_you_mean, "words": words, "items": items, "took_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+def _book_key(book_id: str) -> Optional[str]:
+    """Canonical (lowercase hex) form of a book id, used for every cache key; None if malformed"""
+    return str(ObjectId(book_id)) if ObjectId.is_valid(book_id) else None
+
+async def _load_book(book_id: str) -> Optional[tuple]:
+    generation = catalog_cache.generation
+    doc = await get_document_by_id_async("book", book_id)
     if not doc:
+        return None
+    cached = (dumps(to_public(doc)), doc.get("updated_at"))
+    if generation == catalog_cache.generation:
+        catalog_cache.books.set(book_id, cached)
+    return cached
+
+class BookBatchGet(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_GET_IDS)
+
+@app.post("/books/batch-get")
+async def batch_get_books(payload: BookBatchGet):
+    """Books for many ids in request order: catalog cache first, then one $in query.
+
+    Duplicate ids are returned once; unknown and malformed ids are listed in `missing`
+    as they were sent.
+    """
+    canonical = {raw: _book_key(raw) for raw in payload.ids}
+    ids = list(dict.fromkeys(book_id for book_id in canonical.values() if book_id))
+    bodies: Dict[str, bytes] = {}
+    misses = []
+    for book_id in ids:
+        cached = catalog_cache.books.get(book_id)
+        if cached is not None:
+            bodies[book_id] = cached[0]
+        else:
+            misses.append(ObjectId(book_id))
+    if misses:
+        generation = catalog_cache.generation
+        async for doc in _book_collection().find({"_id": {"$in": misses}}):
+            book_id = str(doc["_id"])
+            bodies[book_id] = dumps(to_public(doc))
+            if generation == catalog_cache.generation:
+                catalog_cache.books.set(book_id, (bodies[book_id], doc.get("updated_at")))
+    missing = [raw for raw, book_id in canonical.items() if book_id not in bodies]
+    # Cached entries are already encoded, so the response is spliced together rather than re-serialized
+    items = b",".join(bodies[book_id] for book_id in ids if book_id in bodies)
+    return RawJSONResponse(b'{"items":[' + items + b'],"missing":' + dumps(missing) + b"}")
+
+@app.get("/books/{book_id}")
+async def get_book(book_id: str, request: Request):
+    book_id = _book_key(book_id)
+    if book_id is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    doc["id"] = str(doc.pop("_id"))
-    return doc
+    cached = catalog_cache.books.get(book_id)
+    if cached is None:
+        cached = await catalog_flight.do(("book", book_id), lambda: _load_book(book_id))
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    body, updated_at = cached
+    etag = f'"{book_id}-{_epoch_ms(updated_at) if updated_at else 0}"'
+    return _conditional_response(request, body, etag, updated_at)
 
 @app.put("/books/{book_id}")
-def update_book(book_id: str, payload: BookUpdate):
-    updated = update_document("book", book_id, {k: v for k, v in payload.model_dump().items() if v is not None})
-    if not updated:
-        raise HTTPException(status_code=404, detail="Book not found or no changes")
-    doc = get_document_by_id("book", book_id)
-    doc["id"] = str(doc.pop("_id"))
-    return doc
+async def update_book(book_id: str, payload: BookUpdate):
+    doc = await update_document_async("book", book_id, {k: v for k, v in payload.model_dump().items() if v is not None})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Book not found")
+    catalog_cache.invalidate_book(str(doc["_id"]))
+    catalog_search.add_book(doc)
+    return MongoJSONResponse(to_public(doc))
 
 @app.delete("/books/{book_id}")
-def delete_book(book_id: str):
-    ok = delete_document("book", book_id)
-    if not ok:
+async def delete_book(book_id: str):
+    book_id = _book_key(book_id)
+    if book_id is None or not await delete_document_async("book", book_id):
         raise HTTPException(status_code=404, detail="Book not found")
+    catalog_cache.invalidate_book(book_id)
+    catalog_search.remove_book(book_id)
+    # Lets other workers drop the book from their search index on their next refresh
+    await _book_tombstone_collection().update_one(
+        {"_id": ObjectId(book_id)}, {"$set": {"deleted_at": datetime.now(timezone.utc)}}, upsert=True
+    )
+    await _bump_stats(total_books=-1)
     return {"status": "deleted"}
 
 
 # ------------------------- Orders -----------------------------
+class OrderLine(BaseModel):
+    book_id: str
+    quantity: int = Field(..., ge=1)
+    # Accepted for backwards compatibility; title and price come from the catalog
+    title: Optional[str] = None
+    price: Optional[float] = None
+
 class OrderCreate(BaseModel):
     customer_name: str
     customer_email: str
-    items: List[OrderItem]
+    items: List[OrderLine] = Field(..., min_length=1)
     notes: Optional[str] = None
 
+
+def _book_quantities(items: List[OrderLine]) -> Dict[ObjectId, int]:
+    """Total quantity per book across order lines"""
+    quantities: Dict[ObjectId, int] = {}
+    for item in items:
+        try:
+            oid = ObjectId(item.book_id)
+        except Exception:
+            raise HTTPException(status_code=400, detail=f"Invalid book id: {item.book_id}")
+        quantities[oid] = quantities.get(oid, 0) + item.quantity
+    return quantities
+
+
+def _reserved_quantities(order: dict) -> Dict[ObjectId, int]:
+    """Stock to put back when an order is cancelled.
+
+    Orders placed before stock was reserved at checkout carry no
+    `stock_reserved` flag and release nothing. Lines with a malformed book id
+    are skipped: this runs after the status change is committed.
+    """
+    quantities: Dict[ObjectId, int] = defaultdict(int)
+    if not order.get("stock_reserved"):
+        return quantities
+    for item in order.get("items", []):
+        book_id = item.get("book_id")
+        if not ObjectId.is_valid(book_id):
+            logger.warning("Order %s: not restocking line with invalid book id %r", order.get("_id"), book_id)
+            continue
+        quantities[ObjectId(book_id)] += item.get("quantity", 0)
+    return quantities
+
+
+async def _restock(quantities: Dict[ObjectId, int]):
+    if not quantities:
+        return
+    now = datetime.now(timezone.utc)
+    await _book_collection().bulk_write(
+        [UpdateOne({"_id": oid}, {"$inc": {"stock": qty}, "$set": {"updated_at": now}}) for oid, qty in quantities.items()],
+        ordered=False,
+    )
+    for oid in quantities:
+        catalog_cache.invalidate_book(str(oid))
+
+
+async def _catalog_prices(book_ids: List[ObjectId]) -> Dict[ObjectId, dict]:
+    """Authoritative title/price per book: catalog cache first, then one $in query"""
+    found: Dict[ObjectId, dict] = {}
+    for oid in book_ids:
+        cached = catalog_cache.books.get(str(oid))
+        if cached is not None:
+            found[oid] = orjson.loads(cached[0])
+    misses = [oid for oid in book_ids if oid not in found]
+    if misses:
+        async for doc in _book_collection().find({"_id": {"$in": misses}}, {"title": 1, "price": 1, "stock": 1}):
+            found[doc["_id"]] = doc
+    return found
+
+
+async def _reserve_stock(quantities: Dict[ObjectId, int]):
+    """Take stock for every book or for none of them (see inventory.reserve).
+
+    Callers resolve the books first (see _catalog_prices).
+    """
+    try:
+        await inventory.reserve(_book_collection(), quantities)
+    except inventory.UnknownBooks as e:
+        raise HTTPException(status_code=400, detail=f"Unknown book ids: {', '.join(map(str, e.book_ids))}")
+    except inventory.InsufficientStock as e:
+        raise HTTPException(status_code=409, detail=f"Insufficient stock for book {e.book_id}")
+    finally:
+        for oid in quantities:
+            catalog_cache.invalidate_book(str(oid))
+
 @app.get("/orders")
-def list_orders():
-    orders = get_documents("order", sort=[["created_at", -1]])
-    for o in orders:
-        o["id"] = str(o.pop("_id"))
-    return orders
+async def list_orders(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    batch_size: int = Query(DEFAULT_STREAM_BATCH, ge=1, le=MAX_STREAM_BATCH),
+    fields: Optional[str] = None,
+):
+    projection = _fields_projection(fields, Order)
+    if _wants_stream(request, stream):
+        return _stream_list("order", batch_size, cursor, projection)
+    etag, last_modified = await _list_validators("order", request)
+    if _is_not_modified(request, etag, last_modified):
+        return _not_modified_response(etag, last_modified)
+    return _conditional_response(request, await _list_page_body("order", limit, cursor, projection), etag, last_modified)
+
+async def _create_order(payload: OrderCreate):
+    # Price every line from the catalog (one round trip), never from the client
+    quantities = _book_quantities(payload.items)
+    catalog = await _catalog_prices(list(quantities))
+    missing = [str(oid) for oid in quantities if oid not in catalog]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Unknown book ids: {', '.join(missing)}")
+    items = []
+    for line in payload.items:
+        book = catalog[ObjectId(line.book_id)]
+        items.append(OrderItem(book_id=line.book_id, title=book["title"], price=book["price"], quantity=line.quantity))
+    total = sum(i.price * i.quantity for i in items)
+    try:
+        order = Order(
+            customer_name=payload.customer_name,
+            customer_email=payload.customer_email,
+            items=items,
+            total_amount=total,
+            status="pending",
+            notes=payload.notes,
+            stock_reserved=True,
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    await _reserve_stock(quantities)
+    try:
+        if order_buffer is not None:
+            doc = await order_buffer.insert(order)
+        else:
+            doc = await create_document_async("order", order)
+    except Exception:
+        await _restock(quantities)
+        raise
+    try:
+        await _record_orders(created=[doc])
+    except Exception:
+        # The order exists, so this must not fail the request (and release its
+        # Idempotency-Key for a duplicate retry); the stats reconciler corrects the
+        # counters and `manage.py rebuild-rollups` the revenue buckets
+        logger.exception("Recording new order %s failed", doc["_id"])
+    return MongoJSONResponse(to_public(doc))
 
 @app.post("/orders")
-def create_order(payload: OrderCreate):
-    # compute total from items
-    total = sum(i.price * i.quantity for i in payload.items)
-    order = Order(
-        customer_name=payload.customer_name,
-        customer_email=payload.customer_email,
-        items=payload.items,
-        total_amount=total,
-        status="pending",
-        notes=payload.notes,
-    )
-    new_id = create_document("order", order)
-    doc = get_document_by_id("order", new_id)
-    doc["id"] = str(doc.pop("_id"))
-    return doc
+async def create_order(payload: OrderCreate, idempotency_key: Optional[str] = Header(None)):
+    return await _idempotent("POST /orders", idempotency_key, payload, lambda: _create_order(payload))
+
+# Allowed order status changes. Cancelled orders have released their stock,
+# so they cannot be reopened; delivered orders are final.
+ORDER_STATUS_TRANSITIONS = {
+    "pending": {"processing", "shipped", "cancelled"},
+    "processing": {"pending", "shipped", "cancelled"},
+    "shipped": {"delivered"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+
+def _check_order_status(status: str):
+    if status not in ORDER_STATUS_TRANSITIONS:
+        raise HTTPException(status_code=400, detail="Invalid status")
+
+
+def _statuses_leading_to(status: str) -> List[str]:
+    return [s for s, targets in ORDER_STATUS_TRANSITIONS.items() if status in targets]
+
 
 class OrderStatusUpdate(BaseModel):
     status: str
 
 @app.put("/orders/{order_id}/status")
-def update_order_status(order_id: str, payload: OrderStatusUpdate):
-    allowed = {"pending", "processing", "shipped", "delivered", "cancelled"}
-    if payload.status not in allowed:
-        raise HTTPException(status_code=400, detail="Invalid status")
-    ok = update_document("order", order_id, {"status": payload.status})
-    if not ok:
-        raise HTTPException(status_code=404, detail="Order not found")
-    doc = get_document_by_id("order", order_id)
-    doc["id"] = str(doc.pop("_id"))
-    return doc
+async def update_order_status(order_id: str, payload: OrderStatusUpdate):
+    _check_order_status(payload.status)
+    before, doc = await update_document_with_previous_async(
+        "order", order_id, {"status": payload.status}, extra_filter={"status": {"$in": _statuses_leading_to(payload.status)}}
+    )
+    if not doc:
+        current = await get_document_by_id_async("order", order_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if current.get("status") == payload.status:
+            return MongoJSONResponse(to_public(current))
+        raise HTTPException(status_code=409, detail=f"Cannot change status from {current.get('status')} to {payload.status}")
+    if doc["status"] == "cancelled":
+        await _restock(_reserved_quantities(doc))
+    await _record_orders(transitions=[(before, doc)])
+    return MongoJSONResponse(to_public(doc))
+
 
+class OrderStatusBulkUpdate(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_STATUS_IDS)
+    status: str
+
+@app.post("/orders/status/bulk")
+async def bulk_update_order_status(payload: OrderStatusBulkUpdate):
+    """Move many orders to one status with a single bulk_write.
+
+    Per-id outcome: updated, unchanged (already in that status), not_found,
+    invalid_transition, or conflict (changed by someone else in between).
+    Each update is guarded by the status that was read, so a concurrent
+    change is never overwritten or counted twice.
+    """
+    _check_order_status(payload.status)
+    target = payload.status
+    ids = list(dict.fromkeys(payload.ids))
+    oids = {order_id: ObjectId(order_id) for order_id in ids if ObjectId.is_valid(order_id)}
+    current = {doc["_id"]: doc async for doc in _order_collection().find({"_id": {"$in": list(oids.values())}})}
+
+    outcomes: Dict[str, str] = {}
+    candidates = []
+    for order_id in ids:
+        doc = current.get(oids.get(order_id))
+        if doc is None:
+            outcomes[order_id] = "not_found"
+        elif doc.get("status") == target:
+            outcomes[order_id] = "unchanged"
+        elif target not in ORDER_STATUS_TRANSITIONS.get(doc.get("status"), ()):
+            outcomes[order_id] = "invalid_transition"
+        else:
+            candidates.append((order_id, doc))
+
+    # Stored exactly as generated, so the stamp can be compared on re-read
+    now = utc_now()
+    updated = []
+    if candidates:
+        result = await _order_collection().bulk_write([
+            UpdateOne({"_id": doc["_id"], "status": doc["status"]}, {"$set": {"status": target, "updated_at": now}})
+            for _, doc in candidates
+        ], ordered=False)
+        if result.matched_count == len(candidates):
+            updated = candidates
+        else:
+            # Some guards missed: find out which writes were ours
+            ours = {
+                doc["_id"] async for doc in _order_collection().find(
+                    {"_id": {"$in": [doc["_id"] for _, doc in candidates]}, "status": target, "updated_at": now}, {"_id": 1}
+                )
+            }
+            for order_id, doc in candidates:
+                if doc["_id"] in ours:
+                    updated.append((order_id, doc))
+                else:
+                    outcomes[order_id] = "conflict"
+
+    # The statuses are committed: from here on failures are logged, never raised,
+    # so the caller still gets the per-id outcomes
+    transitions = []
+    restock: Dict[ObjectId, int] = defaultdict(int)
+    for order_id, before in updated:
+        outcomes[order_id] = "updated"
+        transitions.append((before, {**before, "status": target, "updated_at": now}))
+        if target == "cancelled":
+            for oid, qty in _reserved_quantities(before).items():
+                restock[oid] += qty
+    try:
+        await _restock(restock)
+    except Exception:
+        logger.exception("Restocking %d books after bulk cancellation failed", len(restock))
+    try:
+        await _record_orders(transitions=transitions)
+    except Exception:
+        # The stats reconciler corrects the counters
+        logger.exception("Recording %d order status changes failed", len(transitions))
+
+    counts = defaultdict(int)
+    for outcome in outcomes.values():
+        counts[outcome] += 1
+    return {
+        "status": target,
+        "results": [{"id": order_id, "outcome": outcomes[order_id]} for order_id in ids],
+        "counts": dict(counts),
+    }
 
 if __name__ == "__main__":
     import uvicorn
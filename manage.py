@@ -0,0 +1,48 @@
+"""
+Management Commands
+
+Usage:
+    python manage.py indexes [--check] [--drop-extra]
+    python manage.py rebuild-rollups
+"""
+
+import argparse
+import json
+import sys
+
+import rollups
+from database import db, ensure_indexes
+from schemas import INDEXES
+
+
+def cmd_indexes(args) -> int:
+    report = ensure_indexes(INDEXES, create=not args.check, drop_extra=args.drop_extra)
+    print(json.dumps(report, indent=2))
+    drift = any(entry["missing"] or entry["conflicting"] or entry["ttl_changed"] or entry["errors"] for entry in report.values())
+    return 1 if drift else 0
+
+
+def cmd_rebuild_rollups(args) -> int:
+    count = rollups.rebuild(db)
+    print(f"Rebuilt {count} rollup buckets")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bookstore backend management commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    indexes = sub.add_parser("indexes", help="Apply schemas.INDEXES and report missing/extra indexes")
+    indexes.add_argument("--check", action="store_true", help="Only report, do not create missing indexes")
+    indexes.add_argument("--drop-extra", action="store_true", help="Drop indexes not declared in the registry")
+    indexes.set_defaults(func=cmd_indexes)
+
+    rebuild = sub.add_parser("rebuild-rollups", help="Recompute hourly/daily revenue rollups from orders")
+    rebuild.set_defaults(func=cmd_rebuild_rollups)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Password Hashing
+
+pbkdf2 hashing and verification are pure CPU work that hold the GIL for tens
+of milliseconds. They run in a dedicated process pool with its own
+concurrency limit and a bounded wait queue, so a burst of logins cannot
+starve the event loop (and every other endpoint) in the serving process.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+# Use pbkdf2_sha256 to avoid bcrypt backend issues in some environments
+pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", "2"))
+# Jobs allowed to run at once; the rest wait, up to PASSWORD_MAX_QUEUE
+PASSWORD_MAX_CONCURRENCY = int(os.getenv("PASSWORD_MAX_CONCURRENCY", str(PASSWORD_POOL_WORKERS)))
+PASSWORD_MAX_QUEUE = int(os.getenv("PASSWORD_MAX_QUEUE", "64"))
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password queue is full; callers should answer 503"""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_semaphore = asyncio.Semaphore(PASSWORD_MAX_CONCURRENCY)
+_queued = 0
+_running = 0
+_counters = {"completed": 0, "rejected": 0, "max_queue_depth": 0}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process that already runs driver threads is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    try:
+        return pwd_context.verify(password, password_hash)
+    except ValueError:
+        # Empty or unrecognised hash
+        return False
+
+
+async def _run(fn, *args):
+    global _queued, _running
+    if _queued >= PASSWORD_MAX_QUEUE:
+        _counters["rejected"] += 1
+        raise PasswordPoolBusy()
+    _queued += 1
+    _counters["max_queue_depth"] = max(_counters["max_queue_depth"], _queued)
+    waiting = True
+    try:
+        async with _semaphore:
+            _queued -= 1
+            waiting = False
+            _running += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(_get_executor(), fn, *args)
+            finally:
+                _running -= 1
+                _counters["completed"] += 1
+    finally:
+        if waiting:
+            _queued -= 1
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password in the password pool"""
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    """Verify a password against its hash in the password pool"""
+    return await _run(_verify, password, password_hash)
+
+
+def metrics() -> dict:
+    """Queue depth and throughput counters for the password pool"""
+    return {
+        "workers": PASSWORD_POOL_WORKERS,
+        "max_concurrency": PASSWORD_MAX_CONCURRENCY,
+        "max_queue": PASSWORD_MAX_QUEUE,
+        "queue_depth": _queued,
+        "running": _running,
+        **_counters,
+    }
+
+
+def shutdown():
+    """Stop the worker processes"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
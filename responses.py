@@ -0,0 +1,43 @@
+"""
+JSON Responses
+
+orjson-backed response class for Mongo documents. ObjectId is encoded as a
+string and datetime natively by orjson, so routes can return raw documents
+without a jsonable_encoder pass over every value.
+"""
+
+from typing import Any, Dict
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse, Response
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any, option: int = 0) -> bytes:
+    """Serialize to JSON bytes with Mongo-aware encoders"""
+    return orjson.dumps(content, default=_default, option=option)
+
+
+def to_public(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Expose a Mongo document's _id as `id` (in place)"""
+    doc["id"] = doc.pop("_id")
+    return doc
+
+
+class MongoJSONResponse(JSONResponse):
+    """Return this directly from a route to bypass jsonable_encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """Send an already-encoded JSON body (e.g. from a cache) as is"""
+
+    media_type = "application/json"
@@ -7,6 +7,9 @@ Model name is converted to lowercase for the collection name:
 - AdminUser -> "adminuser" collection
 - Book -> "book" collection
 - Order -> "order" collection
+
+INDEXES declares the indexes each collection needs; database.ensure_indexes
+applies it at startup or from `python manage.py indexes`.
 """
 
 from pydantic import BaseModel, Field, EmailStr, conlist
@@ -40,3 +43,42 @@ class Order(BaseModel):
     total_amount: float = Field(..., ge=0, description="Computed total amount")
     status: Literal["pending", "processing", "shipped", "delivered", "cancelled"] = Field("pending", description="Order status")
     notes: Optional[str] = Field(None, description="Optional notes")
+    stock_reserved: bool = Field(False, description="Stock was taken for the items when the order was placed")
+
+# How long deleted book ids are kept: delta exports (GET /books/export?updated_since=)
+# can only report deletions this recent, so storefront syncs must run more often
+BOOK_TOMBSTONE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Index registry: collection name -> index definitions (IndexModel keyword
+# arguments). Names are explicit so drift can be detected by name.
+INDEXES = {
+    "adminuser": [
+        {"keys": [("email", 1)], "name": "email_1", "unique": True},
+    ],
+    "book": [
+        {"keys": [("updated_at", 1), ("_id", 1)], "name": "updated_at_1__id_1"},
+        # /books filters in equality, sort, range order: pages walk the index in
+        # page order and price/stock ranges are checked on index keys, so no
+        # in-memory sort and no fetch of non-matching books. The unfiltered one
+        # also serves plain keyset pages, so no separate created_at/_id index
+        {"keys": [("author", 1), ("created_at", -1), ("_id", -1), ("price", 1), ("stock", 1)], "name": "author_1_created_at_-1__id_-1_price_1_stock_1"},
+        {"keys": [("created_at", -1), ("_id", -1), ("price", 1), ("stock", 1)], "name": "created_at_-1__id_-1_price_1_stock_1"},
+    ],
+    "order": [
+        {"keys": [("created_at", -1), ("_id", -1)], "name": "created_at_-1__id_-1"},
+        {"keys": [("status", 1), ("created_at", -1)], "name": "status_1_created_at_-1"},
+        {"keys": [("updated_at", 1), ("_id", 1)], "name": "updated_at_1__id_1"},
+    ],
+    # Dashboard counters and hourly/daily revenue rollups
+    "stats": [
+        {"keys": [("granularity", 1), ("bucket", 1)], "name": "granularity_1_bucket_1"},
+    ],
+    # Idempotency-Key records (_id = scope:key) expire after a day
+    "idempotency": [
+        {"keys": [("created_at", 1)], "name": "created_at_ttl", "expireAfterSeconds": 24 * 60 * 60},
+    ],
+    # Deleted book ids (_id = book _id) for search index sync and delta exports
+    "book_tombstone": [
+        {"keys": [("deleted_at", 1)], "name": "deleted_at_ttl", "expireAfterSeconds": BOOK_TOMBSTONE_TTL_SECONDS},
+    ],
+}
@@ -0,0 +1,469 @@
+"""
+Book Search Index
+
+In-process inverted index over book title, author and description with
+prefix (typeahead) matching on the last query word. Postings are compact
+append-only arrays of (doc number, weight); a changed book gets a fresh doc
+number and its old entries are skipped until the next full rebuild. Doc
+numbers only grow, so every posting array stays sorted and a query's
+window over it is a single slice.
+
+A word found in a book's title or author also gets a key posting, grouped
+by weight. Key postings are walked by impact, from the highest weight down,
+so truncating them only ever drops the lowest-weight and then the oldest
+matches. Only description matches are limited to the newest postings, so an
+old book titled "Love" still ranks above thousands of newer books that
+mention love in passing.
+
+TrigramIndex answers "did you mean" queries for misspelled title and
+author words. CatalogSearch keeps both indexes in step with the book
+collection: writes in this process apply immediately, a periodic refresh picks up other workers'
+writes by updated_at and their deletes from tombstones, and an occasional
+rebuild reclaims stale postings. Only touched from the event loop, so no
+locking is needed.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import re
+import unicodedata
+from array import array
+from datetime import datetime, timedelta, timezone
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+FIELD_WEIGHTS = {"title": 3.0, "author": 2.0, "description": 1.0}
+# Only the start of a description is indexed to bound memory
+DESCRIPTION_MAX_TOKENS = 64
+# Prefixes shorter than this match whole words only
+MIN_PREFIX_LENGTH = 2
+# A prefix expands to its most frequent completions
+MAX_PREFIX_EXPANSIONS = 32
+MAX_CACHED_PREFIXES = 4096
+# Postings of the rarest query word considered first, and at most (newest first)
+MIN_SCANNED_POSTINGS = 4_000
+MAX_SCANNED_POSTINGS = 20_000
+# Upper bound on books scored per query from the newest postings
+MAX_SCORED_CANDIDATES = 2_000
+# Books scored per query word from its key (title/author) postings, which are
+# taken by impact rather than age, so fewer are needed
+MAX_KEY_CANDIDATES = 500
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD_RE.findall(normalize(text)) if text else []
+
+
+class BookSearchIndex:
+    def __init__(self):
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Title/author subset of _postings: term -> weight -> doc numbers
+        self._key_postings: Dict[str, Dict[float, array]] = {}
+        self._vocabulary: List[str] = []  # sorted lazily, for prefix lookups
+        self._vocabulary_sorted = True
+        self._prefix_cache: Dict[str, List[str]] = {}
+        self._doc_numbers: Dict[str, int] = {}
+        self._docs: Dict[int, Tuple[str, str, str, int]] = {}  # doc number -> (id, title, author, term count)
+        self._next_doc = 0
+        self._total_postings = 0
+        self._live_postings = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def garbage_ratio(self) -> float:
+        """Share of postings that belong to removed or re-indexed books"""
+        if not self._total_postings:
+            return 0.0
+        return 1.0 - self._live_postings / self._total_postings
+
+    def add(self, book_id: str, title: Optional[str], author: Optional[str], description: Optional[str] = None):
+        """Index (or re-index) a book"""
+        self.remove(book_id)
+        weights: Dict[str, float] = {}
+        key_terms = set()
+        for field, text in (("title", title), ("author", author), ("description", description)):
+            tokens = tokenize(text)
+            if field == "description":
+                tokens = tokens[:DESCRIPTION_MAX_TOKENS]
+            for token in tokens:
+                if token not in STOPWORDS:
+                    weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+                    if field != "description":
+                        key_terms.add(token)
+
+        doc = self._next_doc
+        self._next_doc += 1
+        self._doc_numbers[book_id] = doc
+        count = len(weights) + len(key_terms)
+        self._docs[doc] = (book_id, title or "", author or "", count)
+        self._total_postings += count
+        self._live_postings += count
+        for term, weight in weights.items():
+            entry = self._postings.get(term)
+            if entry is None:
+                entry = self._postings[term] = (array("I"), array("f"))
+                # Appended unsorted; sorted once on the next prefix lookup
+                self._vocabulary.append(term)
+                self._vocabulary_sorted = False
+            # Dampen repeated words so long descriptions don't dominate
+            weight = 1.0 + math.log(weight)
+            entry[0].append(doc)
+            entry[1].append(weight)
+            if term in key_terms:
+                self._key_postings.setdefault(term, {}).setdefault(weight, array("I")).append(doc)
+
+    def remove(self, book_id: str):
+        doc = self._doc_numbers.pop(book_id, None)
+        if doc is not None:
+            self._live_postings -= self._docs.pop(doc)[3]
+
+    def _expand(self, prefix: str) -> List[str]:
+        """The most frequent words starting with prefix"""
+        if not self._vocabulary_sorted:
+            self._vocabulary.sort()
+            self._vocabulary_sorted = True
+            self._prefix_cache.clear()
+        terms = self._prefix_cache.get(prefix)
+        if terms is None:
+            lo = bisect_left(self._vocabulary, prefix)
+            hi = bisect_left(self._vocabulary, prefix + "\U0010ffff", lo)
+            terms = heapq.nlargest(MAX_PREFIX_EXPANSIONS, self._vocabulary[lo:hi], key=lambda t: len(self._postings[t][0]))
+            if len(self._prefix_cache) >= MAX_CACHED_PREFIXES:
+                self._prefix_cache.clear()
+            self._prefix_cache[prefix] = terms
+        return terms
+
+    def _window(self, term: str, lo: int, candidates: Optional[set]) -> Dict[int, float]:
+        """Weights of term's postings from doc number lo on (only candidates', if given)"""
+        docs, weights = self._postings[term]
+        start = bisect_left(docs, lo)
+        if candidates is not None and len(candidates) * 6 < len(docs) - start:
+            # Few candidates against a long posting list: probe instead of slicing
+            found = {}
+            for doc in candidates:
+                j = bisect_left(docs, doc, start)
+                if j < len(docs) and docs[j] == doc:
+                    found[doc] = weights[j]
+            return found
+        return dict(zip(docs[start:], weights[start:]))
+
+    def _idf(self, term: str) -> float:
+        return math.log(1.0 + len(self._docs) / (1 + len(self._postings[term][0])))
+
+    def _term_factors(self, terms: List[str]) -> List[Tuple[str, float]]:
+        """Score multiplier per term of one query word"""
+        if len(terms) == 1:
+            return [(terms[0], self._idf(terms[0]))]
+        # Prefix completions share the prefix's idf and are ranked by how
+        # common they are, so "wa" favours "water" over a one-off "wazzock"
+        frequencies = [len(self._postings[t][0]) for t in terms]
+        idf = math.log(1.0 + len(self._docs) / (1 + sum(frequencies)))
+        top = 1.0 + math.log(max(frequencies))
+        return [(t, idf * (1.0 + math.log(f)) / top) for t, f in zip(terms, frequencies)]
+
+    def _match(self, factors: List[List[Tuple[str, float]]], lo: int) -> Tuple[set, list]:
+        """Live doc numbers from lo on that match every query word, and the windows that matched"""
+        # Postings are sorted by doc number, so a window is one slice and the
+        # intersections run as set operations rather than per-doc lookups
+        windows = []
+        candidates = None
+        for group_factors in factors:
+            group = [(self._window(term, lo, candidates), factor) for term, factor in group_factors]
+            windows.append(group)
+            if candidates is None:
+                candidates = set().union(*(window for window, _ in group))
+            elif len(group) == 1:
+                candidates.intersection_update(group[0][0])
+            else:
+                candidates = set().union(*(candidates.intersection(window) for window, _ in group))
+            if not candidates:
+                return set(), windows
+            lo = min(candidates)
+        return set(filter(self._docs.__contains__, candidates)), windows
+
+    def _key_match(self, factors: List[List[Tuple[str, float]]], i: int) -> Tuple[set, list]:
+        """Live doc numbers with query word i in their title or author that match every other word.
+
+        Key postings are taken by impact (weight x factor), newest first among
+        equals, until MAX_KEY_CANDIDATES books match or MAX_SCANNED_POSTINGS
+        were tried.
+        """
+        driver, others = factors[i], factors[:i] + factors[i + 1:]
+        buckets = sorted(
+            ((weight * factor, term, weight) for term, factor in driver for weight in self._key_postings.get(term, ())),
+            reverse=True,
+        )
+        ordered = ((doc, term, weight) for _, term, weight in buckets for doc in reversed(self._key_postings[term][weight]))
+        first: Dict[str, Dict[int, float]] = {term: {} for term, _ in driver}
+        windows = [[({}, factor) for _, factor in group] for group in others]
+        matched: set = set()
+        scanned = 0
+        while len(matched) < MAX_KEY_CANDIDATES and scanned < MAX_SCANNED_POSTINGS:
+            # A doc keeps its highest-impact term when several completions match
+            batch: Dict[int, Tuple[str, float]] = {}
+            taken = 0
+            # Batches double while few books match
+            for doc, term, weight in itertools.islice(ordered, max(MAX_KEY_CANDIDATES, scanned)):
+                taken += 1
+                if doc not in matched and doc not in batch:
+                    batch[doc] = (term, weight)
+            if not taken:
+                break
+            scanned += taken
+            chunk = set(batch)
+            found = []
+            for group in others:
+                if not chunk:
+                    break
+                lo = min(chunk)
+                group_windows = [self._window(t, lo, chunk) for t, _ in group]
+                chunk = set().union(*(chunk.intersection(w) for w in group_windows))
+                found.append(group_windows)
+            chunk = set(filter(self._docs.__contains__, chunk))
+            for group, group_windows in zip(windows, found):
+                for (window, _), found_window in zip(group, group_windows):
+                    window.update((doc, found_window[doc]) for doc in chunk.intersection(found_window))
+            for doc in chunk:
+                term, weight = batch[doc]
+                first[term][doc] = weight
+            matched |= chunk
+        return matched, [[(first[term], factor) for term, factor in driver]] + windows
+
+    def search(self, query: str, limit: int = 10, prefix: bool = True) -> List[dict]:
+        """Top `limit` books matching every query word, best first"""
+        words = [w for w in tokenize(query) if w not in STOPWORDS] or tokenize(query)
+        if not words:
+            return []
+        groups = []
+        for i, word in enumerate(words):
+            if prefix and i == len(words) - 1 and len(word) >= MIN_PREFIX_LENGTH:
+                terms = self._expand(word)
+            else:
+                terms = [word] if word in self._postings else []
+            if not terms:
+                return []
+            groups.append(terms)
+
+        # Match against the newest postings of the rarest word first and widen
+        # the window only while too few books match
+        groups.sort(key=lambda terms: sum(len(self._postings[t][0]) for t in terms))
+        factors = [self._term_factors(terms) for terms in groups]
+        size = MIN_SCANNED_POSTINGS
+        while True:
+            lo = max((docs[-size] for docs, _ in (self._postings[t] for t in groups[0]) if len(docs) > size), default=0)
+            candidates, windows = self._match(factors, lo)
+            if len(candidates) >= MAX_SCORED_CANDIDATES or lo == 0 or size >= MAX_SCANNED_POSTINGS:
+                break
+            # Grow by the observed match rate, with some headroom
+            size = min(int(size * 1.25 * MAX_SCORED_CANDIDATES / max(len(candidates), size / 100)), MAX_SCANNED_POSTINGS)
+        if len(candidates) > MAX_SCORED_CANDIDATES:
+            candidates = set(sorted(candidates)[-MAX_SCORED_CANDIDATES:])
+        matches = [(candidates, windows)]
+        # Books with a query word in their title or author are scored however
+        # old they are (see _key_match)
+        scored = set(candidates)
+        for i in range(len(factors)):
+            key_candidates, key_windows = self._key_match(factors, i)
+            key_candidates -= scored
+            if key_candidates:
+                matches.append((key_candidates, key_windows))
+                scored |= key_candidates
+        if not scored:
+            return []
+
+        scores = dict.fromkeys(scored, 0.0)
+        for candidates, windows in matches:
+            for group in windows:
+                best: Dict[int, float] = {}
+                for window, idf in group:
+                    for doc in candidates.intersection(window):
+                        score = window[doc] * idf
+                        if score > best.get(doc, 0.0):
+                            best[doc] = score
+                for doc, score in best.items():
+                    scores[doc] += score
+
+        # Re-rank a short list: boost titles that start with the query
+        phrase = " ".join(words)
+        shortlist = heapq.nlargest(limit * 4, scores.items(), key=lambda kv: kv[1])
+        ranked = []
+        for doc, score in shortlist:
+            book_id, title, author, _ = self._docs[doc]
+            if normalize(title).startswith(phrase):
+                score *= 1.5
+            ranked.append({"id": book_id, "title": title, "author": author, "score": round(score, 4)})
+        ranked.sort(key=lambda r: r["score"], reverse=True)
+        return ranked[:limit]
+
+
+# Fuzzy ("did you mean") matching over the title/author vocabulary
+TRIGRAM_MIN_SIMILARITY = 0.3
+# Trigrams shared by more words than this carry little signal and are skipped
+TRIGRAM_MAX_POSTINGS = 20_000
+MAX_FUZZY_CANDIDATES = 2_000
+
+
+def trigrams(word: str) -> set:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Trigram similarity over the distinct words of titles and authors.
+
+    Memory grows with the vocabulary, not the catalog: each distinct word is
+    stored once with its trigrams, plus a reference count of the books using
+    it so removals can retire words incrementally.
+    """
+
+    def __init__(self):
+        self._word_ids: Dict[str, int] = {}
+        self._words: Dict[int, Tuple[str, int]] = {}  # word id -> (word, trigram count)
+        self._refcounts: Dict[int, int] = {}
+        self._grams: Dict[str, set] = {}
+        self._book_words: Dict[str, Tuple[int, ...]] = {}
+        self._next_word = 0
+
+    def add(self, book_id: str, title: Optional[str], author: Optional[str]):
+        self.remove(book_id)
+        words = {w for w in tokenize(title) + tokenize(author) if len(w) > 2 and not w.isdigit()}
+        ids = []
+        for word in words:
+            word_id = self._word_ids.get(word)
+            if word_id is None:
+                word_id = self._next_word
+                self._next_word += 1
+                grams = trigrams(word)
+                self._word_ids[word] = word_id
+                self._words[word_id] = (word, len(grams))
+                self._refcounts[word_id] = 0
+                for gram in grams:
+                    self._grams.setdefault(gram, set()).add(word_id)
+            self._refcounts[word_id] += 1
+            ids.append(word_id)
+        self._book_words[book_id] = tuple(ids)
+
+    def remove(self, book_id: str):
+        for word_id in self._book_words.pop(book_id, ()):
+            self._refcounts[word_id] -= 1
+            if self._refcounts[word_id] == 0:
+                word, _ = self._words.pop(word_id)
+                del self._refcounts[word_id], self._word_ids[word]
+                for gram in trigrams(word):
+                    postings = self._grams.get(gram)
+                    if postings is not None:
+                        postings.discard(word_id)
+                        if not postings:
+                            del self._grams[gram]
+
+    def similar(self, word: str, limit: int = 5, min_similarity: float = TRIGRAM_MIN_SIMILARITY) -> List[Tuple[str, float]]:
+        """Known words most similar to `word` (Jaccard over trigrams)"""
+        grams = trigrams(word)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            postings = self._grams.get(gram)
+            if postings is None or len(postings) > TRIGRAM_MAX_POSTINGS:
+                continue
+            for word_id in postings:
+                shared[word_id] = shared.get(word_id, 0) + 1
+        if len(shared) > MAX_FUZZY_CANDIDATES:
+            shared = dict(heapq.nlargest(MAX_FUZZY_CANDIDATES, shared.items(), key=lambda kv: kv[1]))
+        scored = []
+        for word_id, common in shared.items():
+            candidate, count = self._words[word_id]
+            similarity = common / (len(grams) + count - common)
+            if similarity >= min_similarity:
+                scored.append((candidate, round(similarity, 4)))
+        return heapq.nlargest(limit, scored, key=lambda kv: kv[1])
+
+    def suggest(self, query: str) -> Optional[str]:
+        """Rewrite each unknown query word to its closest known word"""
+        words = tokenize(query)
+        corrected, changed = [], False
+        for word in words:
+            if word in self._word_ids or len(word) <= 2 or word.isdigit():
+                corrected.append(word)
+                continue
+            best = self.similar(word, limit=1)
+            if best:
+                corrected.append(best[0][0])
+                changed = True
+            else:
+                corrected.append(word)
+        return " ".join(corrected) if changed else None
+
+
+SEARCH_PROJECTION = {"title": 1, "author": 1, "description": 1}
+# Overlap between sync passes, covering clock skew between app servers
+SYNC_OVERLAP = timedelta(seconds=5)
+# Books indexed between yields to the event loop during a rebuild
+REBUILD_YIELD_EVERY = 200
+
+
+class CatalogSearch:
+    """A BookSearchIndex kept in step with the book collection"""
+
+    def __init__(self):
+        self.index = BookSearchIndex()
+        self.fuzzy = TrigramIndex()
+        self.ready = False
+        self.synced_until: Optional[datetime] = None
+
+    def add_book(self, doc: dict):
+        self.index.add(str(doc["_id"]), doc.get("title"), doc.get("author"), doc.get("description"))
+        self.fuzzy.add(str(doc["_id"]), doc.get("title"), doc.get("author"))
+
+    def remove_book(self, book_id: str):
+        self.index.remove(book_id)
+        self.fuzzy.remove(book_id)
+
+    async def rebuild(self, collection, batch_size: int = 5000):
+        """Build a fresh index from the whole collection and swap it in.
+
+        Yields to the event loop every REBUILD_YIELD_EVERY books, so requests
+        keep being served (from the old index) while it runs.
+        """
+        started = datetime.now(timezone.utc) - SYNC_OVERLAP
+        index, fuzzy = BookSearchIndex(), TrigramIndex()
+        count = 0
+        async for doc in collection.find({}, SEARCH_PROJECTION, batch_size=batch_size):
+            index.add(str(doc["_id"]), doc.get("title"), doc.get("author"), doc.get("description"))
+            fuzzy.add(str(doc["_id"]), doc.get("title"), doc.get("author"))
+            count += 1
+            if count % REBUILD_YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        # Books written while this ran are replayed by the next refresh
+        self.index, self.fuzzy = index, fuzzy
+        self.synced_until = started
+        self.ready = True
+
+    async def refresh(self, collection, tombstones=None, batch_size: int = 5000):
+        """Apply books changed or deleted since the last pass (including by other workers).
+
+        tombstones holds {_id: book id, deleted_at} for deleted books.
+        """
+        if not self.ready:
+            return
+        started = datetime.now(timezone.utc) - SYNC_OVERLAP
+        count = 0
+        async for doc in collection.find({"updated_at": {"$gte": self.synced_until}}, SEARCH_PROJECTION, batch_size=batch_size):
+            self.add_book(doc)
+            count += 1
+            if count % REBUILD_YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        if tombstones is not None:
+            async for doc in tombstones.find({"deleted_at": {"$gte": self.synced_until}}, {"_id": 1}, batch_size=batch_size):
+                self.remove_book(str(doc["_id"]))
+        self.synced_until = started
@@ -0,0 +1,72 @@
+"""
+Single-Flight Request Coalescing
+
+Concurrent calls with the same key share one in-flight coroutine and its
+result (or exception) instead of each running the same query. The shared
+call runs as its own task, so a caller that disconnects does not cancel it
+for the others.
+
+With `stale_seconds` > 0, a result younger than that window is returned
+immediately while one background call revalidates it (stale-while-revalidate).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self, stale_seconds: float = 0.0, max_stale_entries: int = 1024):
+        self.stale_seconds = stale_seconds
+        self.max_stale_entries = max_stale_entries
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._recent: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+        self.stale_served = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return fn()'s result, sharing one execution among concurrent callers"""
+        self.calls += 1
+        if self.stale_seconds > 0:
+            recent = self._recent.get(key)
+            if recent is not None and recent[0] > time.monotonic():
+                self.stale_served += 1
+                self._start(key, fn)
+                return recent[1]
+        if key in self._inflight:
+            self.shared += 1
+        return await asyncio.shield(self._start(key, fn))
+
+    def _start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(self._run(key, fn))
+            # Nobody may be left to await a failed revalidation; mark it seen
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await fn()
+            if self.stale_seconds > 0:
+                self._recent[key] = (time.monotonic() + self.stale_seconds, result)
+                self._recent.move_to_end(key)
+                while len(self._recent) > self.max_stale_entries:
+                    self._recent.popitem(last=False)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def metrics(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared": self.shared,
+            "stale_served": self.stale_served,
+            "in_flight": len(self._inflight),
+        }
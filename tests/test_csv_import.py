@@ -0,0 +1,82 @@
+import asyncio
+import csv
+import unittest
+from unittest import mock
+
+import csv_import
+
+
+async def _lines(text):
+    for line in text.split("\n"):
+        yield line
+
+
+def parse(text):
+    async def collect():
+        return [row async for row in csv_import.rows(_lines(text))]
+    return asyncio.run(collect())
+
+
+class RecordsTests(unittest.TestCase):
+    def test_complete_records(self):
+        rows, rest = csv_import.records(['a,b\n', '1,"x\n', 'y"\n'])
+        self.assertEqual(rows, [["a", "b"], ["1", "x\ny"]])
+        self.assertEqual(rest, [])
+
+    def test_unfinished_record_is_returned_as_lines(self):
+        lines = ['a,b\n', '1,2\n', '3,"open\n', 'still open\n']
+        rows, rest = csv_import.records(lines)
+        self.assertEqual(rows, [["a", "b"], ["1", "2"]])
+        self.assertEqual(rest, lines[2:])
+
+    def test_unquoted_inch_mark(self):
+        rows, rest = csv_import.records(['12" Ruler,Ann\n', 'Next,Bob\n'])
+        self.assertEqual(rows, [['12" Ruler', "Ann"], ["Next", "Bob"]])
+        self.assertEqual(rest, [])
+
+    def test_oversized_field_is_reported_and_parsing_resumes(self):
+        big = "x" * (csv.field_size_limit() + 1)
+        rows, rest = csv_import.records(["a,b\n", f"{big},1\n", "c,d\n"])
+        self.assertEqual(rows[0], ["a", "b"])
+        self.assertIsInstance(rows[1], csv.Error)
+        self.assertEqual(rows[2:], [["c", "d"]])
+        self.assertEqual(rest, [])
+
+
+class RowsTests(unittest.TestCase):
+    def test_header_maps_rows_and_empty_cells_are_dropped(self):
+        self.assertEqual(
+            parse('title,author,price\nBook 12" Ruler,Ann,5\n\nOther,,7\n'),
+            [{"title": 'Book 12" Ruler', "author": "Ann", "price": "5"}, {"title": "Other", "price": "7"}],
+        )
+
+    def test_quoted_field_across_a_batch_boundary(self):
+        text = 'title,description\nA,"line one\nline two\nline three"\nB,plain\n'
+        for batch in (1, 2, 3, csv_import.PARSE_BATCH_LINES):
+            with self.subTest(batch=batch), mock.patch.object(csv_import, "PARSE_BATCH_LINES", batch):
+                self.assertEqual(parse(text), [
+                    {"title": "A", "description": "line one\nline two\nline three"},
+                    {"title": "B", "description": "plain"},
+                ])
+
+    def test_unterminated_field(self):
+        rows = parse('title,description\nA,ok\nB,"never closed\nmore\n')
+        self.assertEqual(rows[0], {"title": "A", "description": "ok"})
+        self.assertEqual(len(rows), 2)
+        self.assertIsInstance(rows[1], ValueError)
+
+    def test_record_spanning_too_many_lines(self):
+        text = "title,description\n" + 'A,"' + "\n" * 10 + 'end"\nB,ok\n'
+        with mock.patch.object(csv_import, "PARSE_BATCH_LINES", 2), mock.patch.object(csv_import, "MAX_RECORD_LINES", 4):
+            rows = parse(text)
+        self.assertIsInstance(rows[0], ValueError)
+
+    def test_oversized_field_does_not_abort_the_import(self):
+        big = "x" * (csv.field_size_limit() + 1)
+        rows = parse(f"title,description\nA,{big}\nB,ok\n")
+        self.assertIsInstance(rows[0], csv.Error)
+        self.assertEqual(rows[1:], [{"title": "B", "description": "ok"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from pymongo.errors import DuplicateKeyError
+
+import idempotency
+from responses import RawJSONResponse
+
+
+class FakeRecords:
+    """In-memory stand-in for the idempotency collection"""
+
+    def __init__(self):
+        self.docs = {}
+
+    @staticmethod
+    def _matches(doc, filter_dict):
+        return all(doc.get(k) == v for k, v in filter_dict.items())
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(0)
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate key")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one(self, filter_dict):
+        await asyncio.sleep(0)
+        doc = self.docs.get(filter_dict["_id"])
+        return dict(doc) if doc is not None else None
+
+    async def update_one(self, filter_dict, update):
+        await asyncio.sleep(0)
+        doc = self.docs.get(filter_dict["_id"])
+        if doc is None or not self._matches(doc, filter_dict):
+            return SimpleNamespace(modified_count=0)
+        doc.update(update["$set"])
+        return SimpleNamespace(modified_count=1)
+
+    async def delete_one(self, filter_dict):
+        await asyncio.sleep(0)
+        self.docs.pop(filter_dict["_id"], None)
+
+
+class Handler:
+    """Returns {"id": <call number>}; the first `failures` calls raise"""
+
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        failing = self.calls <= self.failures
+        if self.release is not None:
+            await self.release.wait()
+        if failing:
+            raise RuntimeError("handler failed")
+        return RawJSONResponse(b'{"id":%d}' % self.calls, status_code=201)
+
+
+class RunTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.records = FakeRecords()
+        patcher = mock.patch.object(idempotency, "get_async_collection", return_value=self.records)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_duplicate_replays_stored_response(self):
+        handler = Handler()
+        first = await idempotency.run("POST /books", "k1", "hash", handler)
+        second = await idempotency.run("POST /books", "k1", "hash", handler)
+        self.assertEqual(handler.calls, 1)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((second.status_code, bytes(second.body)), (201, b'{"id":1}'))
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+
+    async def test_scopes_are_independent(self):
+        handler = Handler()
+        await idempotency.run("POST /books", "k1", "hash", handler)
+        await idempotency.run("POST /orders", "k1", "hash", handler)
+        self.assertEqual(handler.calls, 2)
+
+    async def test_concurrent_duplicate_waits_for_first(self):
+        handler = Handler()
+        handler.release = asyncio.Event()
+        first = asyncio.create_task(idempotency.run("POST /orders", "k1", "hash", handler))
+        second = asyncio.create_task(idempotency.run("POST /orders", "k1", "hash", handler))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        self.assertFalse(second.done())
+        handler.release.set()
+        first, second = await asyncio.gather(first, second)
+        self.assertEqual(handler.calls, 1)
+        self.assertEqual(bytes(second.body), bytes(first.body))
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+
+    async def test_failed_first_request_releases_key(self):
+        handler = Handler(failures=1)
+        with self.assertRaises(RuntimeError):
+            await idempotency.run("POST /orders", "k1", "hash", handler)
+        self.assertEqual(self.records.docs, {})
+        response = await idempotency.run("POST /orders", "k1", "hash", handler)
+        self.assertEqual((handler.calls, bytes(response.body)), (2, b'{"id":2}'))
+
+    async def test_duplicate_of_failed_request_runs_again(self):
+        handler = Handler(failures=1)
+        handler.release = asyncio.Event()
+        first = asyncio.create_task(idempotency.run("POST /orders", "k1", "hash", handler))
+        second = asyncio.create_task(idempotency.run("POST /orders", "k1", "hash", handler))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        handler.release.set()
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        # The first request failed; the waiting duplicate then claimed the key and ran
+        self.assertEqual(handler.calls, 2)
+        self.assertEqual(sum(isinstance(r, RawJSONResponse) for r in results), 1)
+
+    async def test_payload_mismatch(self):
+        await idempotency.run("POST /orders", "k1", "hash-a", Handler())
+        with self.assertRaises(idempotency.IdempotencyKeyReused):
+            await idempotency.run("POST /orders", "k1", "hash-b", Handler())
+
+    async def test_expired_lease_is_taken_over(self):
+        stale = datetime.now(timezone.utc) - timedelta(seconds=idempotency.IDEMPOTENCY_LEASE_SECONDS + 1)
+        self.records.docs["POST /orders:k1"] = {
+            "_id": "POST /orders:k1", "fingerprint": "hash", "state": "in_progress",
+            "created_at": stale, "locked_at": stale.replace(tzinfo=None),
+        }
+        handler = Handler()
+        response = await idempotency.run("POST /orders", "k1", "hash", handler)
+        self.assertEqual(handler.calls, 1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.records.docs["POST /orders:k1"]["state"], "done")
+
+    async def test_live_lease_times_out(self):
+        now = datetime.now(timezone.utc)
+        self.records.docs["POST /orders:k1"] = {
+            "_id": "POST /orders:k1", "fingerprint": "hash", "state": "in_progress",
+            "created_at": now, "locked_at": now.replace(tzinfo=None),
+        }
+        handler = Handler()
+        with mock.patch.object(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.05):
+            with self.assertRaises(idempotency.IdempotencyInProgress):
+                await idempotency.run("POST /orders", "k1", "hash", handler)
+        self.assertEqual(handler.calls, 0)
+
+
+class FingerprintTests(unittest.TestCase):
+    def test_key_order_does_not_matter(self):
+        self.assertEqual(idempotency.fingerprint({"a": 1, "b": 2}), idempotency.fingerprint({"b": 2, "a": 1}))
+        self.assertNotEqual(idempotency.fingerprint({"a": 1}), idempotency.fingerprint({"a": 2}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import inventory
+
+
+class FakeBooks:
+    """In-memory stand-in for the book collection (update_one/find only)"""
+
+    def __init__(self, stock, fail=()):
+        self.docs = {book_id: {"_id": book_id, "stock": qty} for book_id, qty in stock.items()}
+        self.fail = set(fail)
+
+    async def update_one(self, filter_dict, update):
+        await asyncio.sleep(0)
+        book_id = filter_dict["_id"]
+        if book_id in self.fail:
+            raise ConnectionError("network blip")
+        doc = self.docs.get(book_id)
+        if doc is None or doc["stock"] < filter_dict.get("stock", {}).get("$gte", float("-inf")):
+            return SimpleNamespace(matched_count=0)
+        doc["stock"] += update["$inc"]["stock"]
+        doc["updated_at"] = update["$set"]["updated_at"]
+        return SimpleNamespace(matched_count=1)
+
+    def find(self, filter_dict, projection=None):
+        wanted = filter_dict["_id"]["$in"]
+
+        async def iterate():
+            for book_id in wanted:
+                if book_id in self.docs:
+                    yield {"_id": book_id}
+        return iterate()
+
+    def stock(self):
+        return {book_id: doc["stock"] for book_id, doc in self.docs.items()}
+
+
+class ReserveTests(unittest.TestCase):
+    def test_takes_every_line(self):
+        books = FakeBooks({"a": 5, "b": 2})
+        asyncio.run(inventory.reserve(books, {"a": 3, "b": 2}))
+        self.assertEqual(books.stock(), {"a": 2, "b": 0})
+
+    def test_insufficient_stock_rolls_back_applied_lines(self):
+        books = FakeBooks({"a": 5, "b": 1, "c": 4})
+        with self.assertRaises(inventory.InsufficientStock) as ctx:
+            asyncio.run(inventory.reserve(books, {"a": 3, "b": 2, "c": 4}))
+        self.assertEqual(ctx.exception.book_id, "b")
+        self.assertEqual(books.stock(), {"a": 5, "b": 1, "c": 4})
+
+    def test_unknown_book_is_not_created(self):
+        books = FakeBooks({"a": 5})
+        with self.assertRaises(inventory.UnknownBooks) as ctx:
+            asyncio.run(inventory.reserve(books, {"a": 1, "gone": 1}))
+        self.assertEqual(ctx.exception.book_ids, ["gone"])
+        self.assertEqual(books.stock(), {"a": 5})
+
+    def test_unknown_reported_before_insufficient(self):
+        books = FakeBooks({"a": 0})
+        with self.assertRaises(inventory.UnknownBooks):
+            asyncio.run(inventory.reserve(books, {"a": 1, "gone": 1}))
+
+    def test_write_error_rolls_back_and_propagates(self):
+        books = FakeBooks({"a": 5, "b": 5}, fail={"b"})
+        with self.assertRaises(ConnectionError):
+            asyncio.run(inventory.reserve(books, {"a": 2, "b": 2}))
+        self.assertEqual(books.stock(), {"a": 5, "b": 5})
+
+    def test_concurrent_reservations_never_oversell(self):
+        books = FakeBooks({"a": 3, "b": 10})
+
+        async def checkout():
+            try:
+                await inventory.reserve(books, {"a": 1, "b": 1})
+                return True
+            except inventory.InsufficientStock:
+                return False
+
+        async def burst():
+            return await asyncio.gather(*(checkout() for _ in range(8)))
+
+        succeeded = sum(asyncio.run(burst()))
+        self.assertEqual(succeeded, 3)
+        self.assertEqual(books.stock(), {"a": 0, "b": 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import search_index
+from search_index import BookSearchIndex, CatalogSearch, TrigramIndex, normalize, tokenize
+
+
+def ids(results):
+    return [r["id"] for r in results]
+
+
+class TokenizeTests(unittest.TestCase):
+    def test_normalizes_case_and_accents(self):
+        self.assertEqual(normalize("Élan VITAL"), "elan vital")
+        self.assertEqual(tokenize("Café, crème!"), ["cafe", "creme"])
+        self.assertEqual(tokenize(None), [])
+
+
+class BookSearchIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = BookSearchIndex()
+
+    def test_title_outranks_description(self):
+        self.index.add("desc", "Cooking Basics", "Ann Lee", "a story about dragons")
+        self.index.add("title", "Dragons of Autumn", "Tracy Hickman")
+        self.assertEqual(ids(self.index.search("dragons")), ["title", "desc"])
+
+    def test_title_prefix_boost(self):
+        self.index.add("inside", "The Last Dragon Rider", "A")
+        self.index.add("starts", "Dragon Rider", "B")
+        self.assertEqual(ids(self.index.search("dragon rider"))[0], "starts")
+
+    def test_every_word_must_match(self):
+        self.index.add("both", "War and Peace", "Leo Tolstoy")
+        self.index.add("one", "Peace Talks", "Jim Butcher")
+        self.assertEqual(ids(self.index.search("war peace")), ["both"])
+        self.assertEqual(self.index.search("war dragons"), [])
+
+    def test_prefix_matches_last_word_only(self):
+        self.index.add("b1", "Water World", "Kevin")
+        self.assertEqual(ids(self.index.search("water wor")), ["b1"])
+        self.assertEqual(self.index.search("wat world"), [])
+        self.assertEqual(self.index.search("water wor", prefix=False), [])
+
+    def test_prefix_expands_to_most_frequent_words(self):
+        for i in range(search_index.MAX_PREFIX_EXPANSIONS + 8):
+            self.index.add(f"rare{i}", f"wa{i:03d}x", "Someone")
+        for i in range(50):
+            self.index.add(f"ww{i}", f"Water World {i}", "Someone")
+        results = self.index.search("wa", limit=10)
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(r["id"].startswith("ww") for r in results))
+
+    def test_prefix_cache_sees_new_words(self):
+        self.index.add("b1", "Winter", "A")
+        self.assertEqual(ids(self.index.search("wi")), ["b1"])
+        self.index.add("b2", "Wild", "A")
+        self.assertCountEqual(ids(self.index.search("wi")), ["b1", "b2"])
+
+    def test_remove(self):
+        self.index.add("b1", "Dune", "Frank Herbert")
+        self.index.add("b2", "Dune Messiah", "Frank Herbert")
+        self.index.remove("b1")
+        self.assertEqual(ids(self.index.search("dune")), ["b2"])
+        self.assertEqual(len(self.index), 1)
+        self.index.remove("missing")
+
+    def test_re_add_replaces_old_terms(self):
+        self.index.add("b1", "Old Title", "A")
+        self.index.add("b1", "New Title", "A")
+        self.assertEqual(self.index.search("old"), [])
+        self.assertEqual(ids(self.index.search("new")), ["b1"])
+        self.assertEqual(ids(self.index.search("title")), ["b1"])
+        self.assertEqual(len(self.index), 1)
+
+    def test_garbage_ratio(self):
+        self.assertEqual(self.index.garbage_ratio(), 0.0)
+        self.index.add("b1", "Alpha Beta", "A")
+        self.index.add("b2", "Gamma Delta", "A")
+        self.assertEqual(self.index.garbage_ratio(), 0.0)
+        self.index.remove("b1")
+        self.assertAlmostEqual(self.index.garbage_ratio(), 0.5)
+
+    def test_common_and_rare_words_intersect(self):
+        for i in range(500):
+            self.index.add(f"common{i}", f"Love Story {i}", "A")
+        self.index.add("target", "Love and Zanzibar", "A")
+        self.assertEqual(ids(self.index.search("zanzibar love")), ["target"])
+        self.assertEqual(ids(self.index.search("love zanz")), ["target"])
+
+    def test_old_title_match_outranks_newer_description_matches(self):
+        self.index.add("title", "Love", "A")
+        self.index.add("both", "Love and War", "B")
+        for i in range(30_000):
+            self.index.add(f"desc{i}", f"Book {i}", "C", "a tale of love and war")
+        self.assertEqual(ids(self.index.search("love", limit=5))[:2], ["title", "both"])
+        self.assertEqual(ids(self.index.search("love war", limit=5))[0], "both")
+        self.assertEqual(ids(self.index.search("war lo", limit=5))[0], "both")
+
+    def test_limit(self):
+        for i in range(30):
+            self.index.add(f"b{i}", f"Ocean {i}", "A")
+        self.assertEqual(len(self.index.search("ocean", limit=5)), 5)
+
+
+class TrigramIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.fuzzy = TrigramIndex()
+        self.fuzzy.add("b1", "Pride and Prejudice", "Jane Austen")
+        self.fuzzy.add("b2", "Persuasion", "Jane Austen")
+
+    def test_suggest_corrects_misspelling(self):
+        self.assertEqual(self.fuzzy.suggest("prejudise"), "prejudice")
+        self.assertEqual(self.fuzzy.suggest("jane austin"), "jane austen")
+
+    def test_suggest_known_words_is_none(self):
+        self.assertIsNone(self.fuzzy.suggest("pride"))
+
+    def test_removed_words_are_forgotten(self):
+        self.fuzzy.remove("b1")
+        self.assertNotIn("prejudice", [w for w, _ in self.fuzzy.similar("prejudise")])
+        # Still used by b2
+        self.assertIn("austen", [w for w, _ in self.fuzzy.similar("austin")])
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for CatalogSearch"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, filter_dict, projection=None, batch_size=None):
+        (field, condition), = filter_dict.items() if filter_dict else ((None, None),)
+        matched = [d for d in self.docs if field is None or d[field] >= condition["$gte"]]
+
+        async def iterate():
+            for doc in matched:
+                yield doc
+        return iterate()
+
+
+class CatalogSearchTests(unittest.TestCase):
+    def test_rebuild_then_refresh_applies_updates_and_tombstones(self):
+        old = datetime.now(timezone.utc) - timedelta(hours=1)
+        books = FakeCollection([
+            {"_id": "b1", "title": "Dune", "author": "Frank Herbert", "updated_at": old},
+            {"_id": "b2", "title": "Emma", "author": "Jane Austen", "updated_at": old},
+        ])
+        tombstones = FakeCollection([])
+        search = CatalogSearch()
+        asyncio.run(search.refresh(books, tombstones))
+        self.assertFalse(search.ready)
+
+        asyncio.run(search.rebuild(books))
+        self.assertTrue(search.ready)
+        self.assertEqual(ids(search.index.search("dune")), ["b1"])
+
+        now = datetime.now(timezone.utc)
+        books.docs.append({"_id": "b3", "title": "Dune Messiah", "author": "Frank Herbert", "updated_at": now})
+        tombstones.docs.append({"_id": "b1", "deleted_at": now})
+        asyncio.run(search.refresh(books, tombstones))
+        self.assertEqual(ids(search.index.search("dune")), ["b3"])
+        self.assertEqual(ids(search.index.search("emma")), ["b2"])
+        self.assertIsNone(search.fuzzy.suggest("messiah"))
+
+
+if __name__ == "__main__":
+    unittest.main()
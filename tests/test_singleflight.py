@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+
+from singleflight import SingleFlight
+
+
+class Source:
+    """Counts calls; each call waits for `release` (if set) and returns the next value"""
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        value = self.calls
+        if self.release is not None:
+            await self.release.wait()
+        else:
+            await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError(f"failure {value}")
+        return value
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_execution(self):
+        flight, source = SingleFlight(), Source()
+        results = await asyncio.gather(*(flight.do("k", source) for _ in range(10)))
+        self.assertEqual(results, [1] * 10)
+        self.assertEqual(source.calls, 1)
+        self.assertEqual(flight.metrics()["shared"], 9)
+        self.assertEqual(flight.metrics()["in_flight"], 0)
+
+    async def test_sequential_calls_execute_again(self):
+        flight, source = SingleFlight(), Source()
+        self.assertEqual(await flight.do("k", source), 1)
+        self.assertEqual(await flight.do("k", source), 2)
+
+    async def test_keys_are_independent(self):
+        flight, source = SingleFlight(), Source()
+        await asyncio.gather(flight.do("a", source), flight.do("b", source))
+        self.assertEqual(source.calls, 2)
+
+    async def test_exception_reaches_every_waiter_and_is_not_cached(self):
+        flight, source = SingleFlight(), Source(fail=True)
+        results = await asyncio.gather(*(flight.do("k", source) for _ in range(3)), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(source.calls, 1)
+        source.fail = False
+        self.assertEqual(await flight.do("k", source), 2)
+
+    async def test_cancelled_caller_does_not_cancel_the_shared_call(self):
+        flight, source = SingleFlight(), Source()
+        source.release = asyncio.Event()
+        first = asyncio.create_task(flight.do("k", source))
+        second = asyncio.create_task(flight.do("k", source))
+        await asyncio.sleep(0)
+        first.cancel()
+        source.release.set()
+        self.assertEqual(await second, 1)
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+    async def test_stale_result_served_while_revalidating(self):
+        flight, source = SingleFlight(stale_seconds=60), Source()
+        self.assertEqual(await flight.do("k", source), 1)
+        source.release = asyncio.Event()
+        # Served immediately from the remembered result; one revalidation starts
+        self.assertEqual(await flight.do("k", source), 1)
+        self.assertEqual(await flight.do("k", source), 1)
+        await asyncio.sleep(0)
+        self.assertEqual(source.calls, 2)
+        source.release.set()
+        await asyncio.sleep(0.01)
+        source.release = None
+        self.assertEqual(await flight.do("k", source), 2)
+        self.assertEqual(flight.metrics()["stale_served"], 3)
+
+    async def test_expired_result_is_not_served(self):
+        flight, source = SingleFlight(stale_seconds=0.01), Source()
+        await flight.do("k", source)
+        await asyncio.sleep(0.02)
+        self.assertEqual(await flight.do("k", source), 2)
+        self.assertEqual(flight.metrics()["stale_served"], 0)
+
+    async def test_failed_revalidation_keeps_serving_stale_result(self):
+        flight, source = SingleFlight(stale_seconds=60), Source()
+        await flight.do("k", source)
+        source.fail = True
+        self.assertEqual(await flight.do("k", source), 1)
+        await asyncio.sleep(0.01)
+        self.assertEqual(await flight.do("k", source), 1)
+
+    async def test_remembered_results_are_bounded(self):
+        flight, source = SingleFlight(stale_seconds=60, max_stale_entries=2), Source()
+        for key in ("a", "b", "c"):
+            await flight.do(key, source)
+        self.assertEqual(await flight.do("c", source), 3)
+        # "a" was evicted, so this call waits for a fresh execution
+        self.assertEqual(await flight.do("a", source), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
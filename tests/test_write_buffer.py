@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from pymongo.errors import BulkWriteError, WriteError
+
+import write_buffer
+from write_buffer import GroupCommitBuffer
+
+
+class FakeOrders:
+    """Records insert_many batches; documents whose `fail` flag is set are rejected"""
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(0)
+        self.batches.append(list(docs))
+        if self.error is not None:
+            raise self.error
+        errors = []
+        for i, doc in enumerate(docs):
+            if doc.get("fail"):
+                errors.append({"index": i, "code": 11000, "errmsg": f"duplicate {i}"})
+            else:
+                doc["_id"] = f"id-{len(self.batches)}-{i}"
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+class GroupCommitBufferTests(unittest.IsolatedAsyncioTestCase):
+    def use(self, collection):
+        patcher = mock.patch.object(write_buffer, "get_async_collection", return_value=collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_concurrent_inserts_share_one_batch(self):
+        orders = FakeOrders()
+        self.use(orders)
+        buffer = GroupCommitBuffer("order", window_ms=5, max_docs=100)
+        docs = await asyncio.gather(*(buffer.insert({"n": n}) for n in range(10)))
+        self.assertEqual(len(orders.batches), 1)
+        self.assertEqual([d["n"] for d in docs], list(range(10)))
+        self.assertTrue(all(d["_id"].startswith("id-1-") for d in docs))
+        self.assertTrue(all("created_at" in d and "updated_at" in d for d in docs))
+        metrics = buffer.metrics()
+        self.assertEqual((metrics["batches"], metrics["documents"], metrics["max_batch"]), (1, 10, 10))
+        self.assertEqual(metrics["batch_size_histogram"]["<=10"], 1)
+
+    async def test_full_batch_is_written_without_waiting_for_the_window(self):
+        orders = FakeOrders()
+        self.use(orders)
+        buffer = GroupCommitBuffer("order", window_ms=60_000, max_docs=3)
+        docs = await asyncio.wait_for(asyncio.gather(*(buffer.insert({"n": n}) for n in range(6))), timeout=1)
+        self.assertEqual([len(b) for b in orders.batches], [3, 3])
+        self.assertEqual(len(docs), 6)
+        self.assertEqual(buffer.metrics()["pending"], 0)
+
+    async def test_lone_insert_is_written_after_the_window(self):
+        orders = FakeOrders()
+        self.use(orders)
+        buffer = GroupCommitBuffer("order", window_ms=1, max_docs=100)
+        doc = await asyncio.wait_for(buffer.insert({"n": 1}), timeout=1)
+        self.assertEqual(doc["_id"], "id-1-0")
+
+    async def test_failed_document_fails_only_its_caller(self):
+        orders = FakeOrders()
+        self.use(orders)
+        buffer = GroupCommitBuffer("order", window_ms=5, max_docs=100)
+        results = await asyncio.gather(
+            buffer.insert({"n": 0}), buffer.insert({"n": 1, "fail": True}), buffer.insert({"n": 2}),
+            return_exceptions=True,
+        )
+        self.assertEqual(results[0]["n"], 0)
+        self.assertIsInstance(results[1], WriteError)
+        self.assertEqual(results[2]["n"], 2)
+        self.assertEqual(buffer.metrics()["errors"], 1)
+
+    async def test_batch_error_fails_every_caller(self):
+        self.use(FakeOrders(error=ConnectionError("down")))
+        buffer = GroupCommitBuffer("order", window_ms=5, max_docs=100)
+        results = await asyncio.gather(*(buffer.insert({"n": n}) for n in range(3)), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ConnectionError) for r in results))
+        self.assertEqual(buffer.metrics()["errors"], 3)
+
+    async def test_cancelled_caller_does_not_break_the_batch(self):
+        orders = FakeOrders()
+        self.use(orders)
+        buffer = GroupCommitBuffer("order", window_ms=5, max_docs=100)
+        cancelled = asyncio.create_task(buffer.insert({"n": 0}))
+        kept = asyncio.create_task(buffer.insert({"n": 1}))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        self.assertEqual((await kept)["n"], 1)
+        # The cancelled caller's document was still written with the batch
+        self.assertEqual(len(orders.batches[0]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
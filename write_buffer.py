@@ -0,0 +1,101 @@
+"""
+Group-Commit Write Buffer
+
+Coalesces concurrent single-document inserts into one unordered insert_many.
+A batch is written when `max_docs` inserts are waiting or `window_ms` after
+the first one arrived, whichever comes first. Every caller still gets its own
+inserted document (with _id) or its own error.
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError, WriteError
+
+from database import get_async_collection, prepare_document
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class GroupCommitBuffer:
+    def __init__(self, collection_name: str, window_ms: float = 2.0, max_docs: int = 100):
+        self.collection_name = collection_name
+        self.window = window_ms / 1000.0
+        self.max_docs = max_docs
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self._batches = 0
+        self._documents = 0
+        self._errors = 0
+        self._max_batch = 0
+        self._histogram: Dict[str, int] = {self._bucket(n): 0 for n in (*BATCH_SIZE_BUCKETS, BATCH_SIZE_BUCKETS[-1] + 1)}
+
+    @staticmethod
+    def _bucket(size: int) -> str:
+        for bound in BATCH_SIZE_BUCKETS:
+            if size <= bound:
+                return f"<={bound}"
+        return f">{BATCH_SIZE_BUCKETS[-1]}"
+
+    async def insert(self, data: Union[BaseModel, dict]) -> dict:
+        """Insert one document as part of the next batch and return it with its _id"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prepare_document(data), future))
+        if len(self._pending) >= self.max_docs:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._write(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]):
+        docs = [doc for doc, _ in batch]
+        self._batches += 1
+        self._documents += len(docs)
+        self._max_batch = max(self._max_batch, len(docs))
+        self._histogram[self._bucket(len(docs))] += 1
+
+        failed: Dict[int, Exception] = {}
+        try:
+            # insert_many sets _id on each dict before sending
+            await get_async_collection(self.collection_name).insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                failed[err["index"]] = WriteError(err.get("errmsg", "write error"), err.get("code"), err)
+        except Exception as e:
+            failed = {i: e for i in range(len(docs))}
+        self._errors += len(failed)
+
+        for i, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in failed:
+                future.set_exception(failed[i])
+            else:
+                future.set_result(doc)
+
+    def metrics(self) -> dict:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_docs": self.max_docs,
+            "pending": len(self._pending),
+            "batches": self._batches,
+            "documents": self._documents,
+            "errors": self._errors,
+            "max_batch": self._max_batch,
+            "avg_batch": round(self._documents / self._batches, 2) if self._batches else 0.0,
+            "batch_size_histogram": dict(self._histogram),
+        }